@@ -1,17 +1,19 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import requests
+import asyncio
+from contextlib import asynccontextmanager
+import httpx
+import hashlib
 import os
+import time
 from functools import wraps
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional
 import logging
-
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+import orjson
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
 # Environment variables
@@ -24,6 +26,14 @@ CHROMA_PORT = int(os.getenv('CHROMA_PORT', '8000'))
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'llm')
 OLLAMA_PORT = int(os.getenv('OLLAMA_PORT', '11434'))
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'gemma3n:e2b')
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '200'))
+HTTP_MAX_KEEPALIVE = int(os.getenv('HTTP_MAX_KEEPALIVE', '50'))
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '2'))
+HEALTH_CACHE_TTL = float(os.getenv('HEALTH_CACHE_TTL', '5'))
+# Per-worker bulkhead: concurrent Ollama generations per model, and how many
+# more requests may wait for a slot before new ones are rejected with 503
+OLLAMA_MAX_CONCURRENCY = int(os.getenv('OLLAMA_MAX_CONCURRENCY', '4'))
+OLLAMA_MAX_QUEUE = int(os.getenv('OLLAMA_MAX_QUEUE', '64'))
 
 # Conditional imports based on LLM_PROVIDER
 if LLM_PROVIDER == 'openai':
@@ -43,6 +53,45 @@ elif LLM_PROVIDER == 'anthropic':
         logger.error("Anthropic package not installed but LLM_PROVIDER is 'anthropic'")
         anthropic_client = None
 
+# Shared async HTTP client, created once per worker in the lifespan handler
+http_client: Optional[httpx.AsyncClient] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared HTTP client on startup and close it on shutdown"""
+    global http_client
+    # Keep-alive pool shared by Ollama, ChromaDB and health probes; connection
+    # failures are retried before surfacing as errors
+    http_client = httpx.AsyncClient(
+        timeout=60,
+        transport=httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=30
+            ),
+            retries=HTTP_RETRIES
+        )
+    )
+    yield
+    await http_client.aclose()
+
+# Initialize FastAPI app
+app = FastAPI(title='LLM Dispatcher', lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(
+    CORSMiddleware,  # Enable CORS for all routes
+    allow_origins=['*'],
+    allow_methods=['*'],
+    allow_headers=['*']
+)
+
+async def read_json(request: Request) -> Optional[Dict[str, Any]]:
+    """Parse the request body as JSON, returning None if it is missing or invalid"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
 def query_openai(prompt: str, model: str = None) -> Dict[str, Any]:
     """Send a query to OpenAI"""
     if not openai_client:
@@ -86,7 +135,48 @@ def query_anthropic(prompt: str, model: str = None) -> Dict[str, Any]:
     except Exception as e:
         return {"error": f"Failed to query Anthropic: {str(e)}"}
 
-def query_ollama(prompt: str, model: str = None, stream: bool = False) -> Dict[str, Any]:
+class BulkheadFullError(Exception):
+    """Raised when a model already has the maximum number of queued requests"""
+
+class ModelBulkhead:
+    """
+    Bound concurrent LLM calls per model so one GPU is not flooded
+
+    slot() admits at most max_concurrent calls per model at a time, and
+    admit() rejects new requests once max_queue more are already waiting.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.pending: Dict[str, int] = {}
+
+    def is_full(self, model: str) -> bool:
+        """Whether a new request for the model would be rejected"""
+        return self.pending.get(model, 0) >= self.max_concurrent + self.max_queue
+
+    @asynccontextmanager
+    async def admit(self, model: str):
+        """Count a request against the model for its whole lifetime"""
+        if self.is_full(model):
+            raise BulkheadFullError(f"Too many pending requests for model {model}")
+        self.pending[model] = self.pending.get(model, 0) + 1
+        try:
+            yield
+        finally:
+            self.pending[model] -= 1
+
+    def slot(self, model: str) -> asyncio.Semaphore:
+        """Semaphore guarding the outbound call for the model"""
+        semaphore = self.semaphores.get(model)
+        if semaphore is None:
+            semaphore = self.semaphores[model] = asyncio.Semaphore(self.max_concurrent)
+        return semaphore
+
+ollama_bulkhead = ModelBulkhead(OLLAMA_MAX_CONCURRENCY, OLLAMA_MAX_QUEUE)
+
+async def query_ollama(prompt: str, model: str = None, stream: bool = False) -> Dict[str, Any]:
     """Send a query to Ollama"""
     url = f"http://{OLLAMA_HOST}:{OLLAMA_PORT}/api/generate"
     
@@ -97,29 +187,109 @@ def query_ollama(prompt: str, model: str = None, stream: bool = False) -> Dict[s
     }
     
     try:
-        response = requests.post(url, json=payload, timeout=60)
+        async with ollama_bulkhead.slot(payload["model"]):
+            response = await http_client.post(url, json=payload, timeout=60)
         if response.status_code == 200:
             return response.json()
         else:
             return {"error": f"Ollama returned status {response.status_code}: {response.text}"}
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         return {"error": "Request to Ollama timed out"}
     except Exception as e:
         return {"error": f"Failed to query Ollama: {str(e)}"}
 
-def query_llm_provider(prompt: str, model: str = None) -> Dict[str, Any]:
+def sse_event(data: Dict[str, Any]) -> bytes:
+    """Encode a payload as a single server-sent event"""
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+async def stream_ollama(prompt: str, model: str) -> AsyncIterator[bytes]:
+    """Relay Ollama's NDJSON generation as server-sent events, one per line"""
+    url = f"http://{OLLAMA_HOST}:{OLLAMA_PORT}/api/generate"
+    payload = {"model": model, "prompt": prompt, "stream": True}
+    
+    try:
+        async with ollama_bulkhead.admit(model), ollama_bulkhead.slot(model):
+            async with http_client.stream('POST', url, json=payload, timeout=60) as response:
+                if response.status_code != 200:
+                    error_text = (await response.aread()).decode('utf-8', errors='replace')
+                    yield sse_event({"error": f"Ollama returned status {response.status_code}: {error_text}"})
+                    return
+                async for line in response.aiter_lines():
+                    if line:
+                        yield b"data: " + line.encode() + b"\n\n"
+    except BulkheadFullError as e:
+        yield sse_event({"error": str(e)})
+    except httpx.TimeoutException:
+        yield sse_event({"error": "Request to Ollama timed out"})
+    except httpx.HTTPError as e:
+        yield sse_event({"error": f"Failed to query Ollama: {str(e)}"})
+
+async def query_llm_provider(prompt: str, model: str = None) -> Dict[str, Any]:
     """Route query to appropriate LLM provider"""
+    # The OpenAI and Anthropic SDK clients are synchronous, so run them in a thread
     if LLM_PROVIDER == 'openai':
-        return query_openai(prompt, model)
+        return await asyncio.to_thread(query_openai, prompt, model)
     elif LLM_PROVIDER == 'anthropic':
-        return query_anthropic(prompt, model)
+        return await asyncio.to_thread(query_anthropic, prompt, model)
     elif LLM_PROVIDER == 'local':
-        return query_ollama(prompt, model)
+        model = model or OLLAMA_MODEL
+        async with ollama_bulkhead.admit(model):
+            return await query_ollama(prompt, model)
     else:
         return {"error": f"Unsupported LLM provider: {LLM_PROVIDER}"}
 
-@app.route('/health', methods=['GET'])
-def health_check():
+class TTLProbe:
+    """
+    Cache the result of an async health probe for a short TTL
+
+    Concurrent callers share a single in-flight probe, and failures are cached
+    like successes so a downed service is not re-probed on every request.
+    """
+
+    def __init__(self, probe, ttl: float):
+        self.probe = probe
+        self.ttl = ttl
+        self.value = None
+        self.expires_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def __call__(self):
+        if time.monotonic() < self.expires_at:
+            return self.value
+        async with self.lock:
+            # Another caller may have refreshed the value while we waited
+            if time.monotonic() < self.expires_at:
+                return self.value
+            self.value = await self.probe()
+            self.expires_at = time.monotonic() + self.ttl
+            return self.value
+
+def ttl_cached(ttl: float):
+    """Decorator wrapping an async probe in a TTLProbe"""
+    def decorator(probe):
+        return TTLProbe(probe, ttl)
+    return decorator
+
+@ttl_cached(HEALTH_CACHE_TTL)
+async def check_chroma() -> str:
+    """Probe the ChromaDB heartbeat endpoint"""
+    try:
+        response = await http_client.get(f"http://{CHROMA_HOST}:{CHROMA_PORT}/api/v2/heartbeat", timeout=2)
+        return "up" if response.status_code == 200 else "down"
+    except Exception:
+        return "down"
+
+@ttl_cached(HEALTH_CACHE_TTL)
+async def check_ollama() -> str:
+    """Probe the Ollama model list endpoint"""
+    try:
+        response = await http_client.get(f"http://{OLLAMA_HOST}:{OLLAMA_PORT}/api/tags", timeout=2)
+        return "up" if response.status_code == 200 else "down"
+    except Exception:
+        return "down"
+
+@app.get('/health')
+async def health_check():
     """Health check endpoint"""
     health_status = {
         "status": "healthy",
@@ -131,48 +301,48 @@ def health_check():
         }
     }
     
-    # Check ChromaDB
-    try:
-        response = requests.get(f"http://{CHROMA_HOST}:{CHROMA_PORT}/api/v2/heartbeat", timeout=2)
-        health_status["services"]["chromadb"] = "up" if response.status_code == 200 else "down"
-    except:
-        health_status["services"]["chromadb"] = "down"
-    
-    # Check LLM service based on provider
+    # Check ChromaDB and the LLM service based on provider; the local
+    # probes run concurrently so the total wait is the slower of the two
     if LLM_PROVIDER == 'local':
-        try:
-            response = requests.get(f"http://{OLLAMA_HOST}:{OLLAMA_PORT}/api/tags", timeout=2)
-            health_status["services"]["llm"] = "up" if response.status_code == 200 else "down"
-        except:
-            health_status["services"]["llm"] = "down"
-    elif LLM_PROVIDER in ['openai', 'anthropic']:
-        # For external providers, we'll mark as up if we have an API key
-        health_status["services"]["llm"] = "up" if LLM_API_KEY else "down"
+        chroma_status, llm_status = await asyncio.gather(check_chroma(), check_ollama())
+        health_status["services"]["chromadb"] = chroma_status
+        health_status["services"]["llm"] = llm_status
+    else:
+        health_status["services"]["chromadb"] = await check_chroma()
+        if LLM_PROVIDER in ['openai', 'anthropic']:
+            # For external providers, we'll mark as up if we have an API key
+            health_status["services"]["llm"] = "up" if LLM_API_KEY else "down"
     
     # Overall status
     if any(status == "down" for status in health_status["services"].values()):
         health_status["status"] = "degraded"
     
-    return jsonify(health_status)
+    return health_status
 
 
-@app.route('/query', methods=['POST'])
-def query_llm():
+@app.post('/query')
+async def query_llm(request: Request):
     """Direct query to LLM endpoint"""
-    data = request.json
+    data = await read_json(request)
     
     if not data or 'prompt' not in data:
-        return jsonify({'error': 'Missing prompt in request body'}), 400
+        return ORJSONResponse({'error': 'Missing prompt in request body'}, status_code=400)
     
     prompt = data['prompt']
     model = data.get('model')
 
     logger.info(f"Querying {LLM_PROVIDER} LLM with prompt: {prompt[:100]}...")
     
-    result = query_llm_provider(prompt, model)
+    if data.get('stream'):
+        return await stream_llm(prompt, model)
+    
+    try:
+        result = await query_llm_provider(prompt, model)
+    except BulkheadFullError as e:
+        return ORJSONResponse({'error': str(e)}, status_code=503, headers={'Retry-After': '1'})
     
     if 'error' in result:
-        return jsonify(result), 500
+        return ORJSONResponse(result, status_code=500)
     
     # Standardize response format
     response_data = {
@@ -202,17 +372,74 @@ def query_llm():
             'output_tokens': result.get('output_tokens', 0)
         })
     
-    return jsonify(response_data)
+    return response_data
+
+async def stream_llm(prompt: str, model: Optional[str]):
+    """
+    Answer a query as a text/event-stream so clients can render tokens early
+
+    Local generations are relayed from Ollama as they are produced; hosted
+    providers are queried as usual and sent as a single event.
+    """
+    headers = {'Cache-Control': 'no-cache'}
+    if LLM_PROVIDER == 'local':
+        model = model or OLLAMA_MODEL
+        if ollama_bulkhead.is_full(model):
+            return ORJSONResponse(
+                {'error': f'Too many pending requests for model {model}'},
+                status_code=503,
+                headers={'Retry-After': '1'}
+            )
+        return StreamingResponse(stream_ollama(prompt, model), media_type='text/event-stream', headers=headers)
+    
+    async def single_event():
+        yield sse_event(await query_llm_provider(prompt, model))
+    
+    return StreamingResponse(single_event(), media_type='text/event-stream', headers=headers)
+
+def prebuilt_json(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialize a static payload once, along with its ETag"""
+    body = orjson.dumps(data)
+    return {'body': body, 'etag': f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'}
+
+def static_json_response(request: Request, prebuilt: Dict[str, Any]) -> Response:
+    """Serve a prebuilt payload, answering 304 when the client's copy is current"""
+    headers = {'Cache-Control': 'public, max-age=3600', 'ETag': prebuilt['etag']}
+    if request.headers.get('if-none-match') == prebuilt['etag']:
+        return Response(status_code=304, headers=headers)
+    return Response(prebuilt['body'], media_type='application/json', headers=headers)
+
+# Model lists for hosted providers never change at runtime
+STATIC_MODEL_LISTS = {
+    'openai': prebuilt_json({
+        'provider': 'openai',
+        'models': [
+            {'name': 'gpt-4', 'description': 'Most capable GPT-4 model'},
+            {'name': 'gpt-4-turbo', 'description': 'GPT-4 Turbo with 128k context'},
+            {'name': 'gpt-3.5-turbo', 'description': 'Fast and affordable model'}
+        ],
+        'default_model': LLM_MODEL
+    }),
+    'anthropic': prebuilt_json({
+        'provider': 'anthropic',
+        'models': [
+            {'name': 'claude-3-opus-20240229', 'description': 'Most powerful Claude model'},
+            {'name': 'claude-3-sonnet-20240229', 'description': 'Balanced performance and speed'},
+            {'name': 'claude-3-haiku-20240307', 'description': 'Fastest Claude model'}
+        ],
+        'default_model': LLM_MODEL or 'claude-3-sonnet-20240229'
+    })
+}
 
-@app.route('/models', methods=['GET'])
-def list_models():
+@app.get('/models')
+async def list_models(request: Request):
     """List available models based on LLM provider"""
     if LLM_PROVIDER == 'local':
         try:
-            response = requests.get(f"http://{OLLAMA_HOST}:{OLLAMA_PORT}/api/tags", timeout=5)
+            response = await http_client.get(f"http://{OLLAMA_HOST}:{OLLAMA_PORT}/api/tags", timeout=5)
             if response.status_code == 200:
                 data = response.json()
-                return jsonify({
+                return {
                     'provider': 'local',
                     'models': [
                         {
@@ -223,61 +450,49 @@ def list_models():
                         for model in data.get('models', [])
                     ],
                     'default_model': OLLAMA_MODEL
-                })
+                }
             else:
-                return jsonify({'error': 'Failed to fetch models from Ollama'}), 500
+                return ORJSONResponse({'error': 'Failed to fetch models from Ollama'}, status_code=500)
         except Exception as e:
-            return jsonify({'error': f'Failed to list models: {str(e)}'}), 500
+            return ORJSONResponse({'error': f'Failed to list models: {str(e)}'}, status_code=500)
     
-    elif LLM_PROVIDER == 'openai':
-        return jsonify({
-            'provider': 'openai',
-            'models': [
-                {'name': 'gpt-4', 'description': 'Most capable GPT-4 model'},
-                {'name': 'gpt-4-turbo', 'description': 'GPT-4 Turbo with 128k context'},
-                {'name': 'gpt-3.5-turbo', 'description': 'Fast and affordable model'}
-            ],
-            'default_model': LLM_MODEL
-        })
-    
-    elif LLM_PROVIDER == 'anthropic':
-        return jsonify({
-            'provider': 'anthropic',
-            'models': [
-                {'name': 'claude-3-opus-20240229', 'description': 'Most powerful Claude model'},
-                {'name': 'claude-3-sonnet-20240229', 'description': 'Balanced performance and speed'},
-                {'name': 'claude-3-haiku-20240307', 'description': 'Fastest Claude model'}
-            ],
-            'default_model': LLM_MODEL or 'claude-3-sonnet-20240229'
-        })
+    elif LLM_PROVIDER in STATIC_MODEL_LISTS:
+        return static_json_response(request, STATIC_MODEL_LISTS[LLM_PROVIDER])
     
     else:
-        return jsonify({'error': f'Unsupported LLM provider: {LLM_PROVIDER}'}), 500
+        return ORJSONResponse({'error': f'Unsupported LLM provider: {LLM_PROVIDER}'}, status_code=500)
 
 
-@app.route('/', methods=['GET'])
-def index():
-    """API documentation"""
-    return jsonify({
-        'name': 'LLM Dispatcher',
-        'version': '1.0',
-        'provider': LLM_PROVIDER,
-        'endpoints': {
-            '/health': 'GET - Health check',
-            '/query': 'POST - Direct LLM query',
-            '/models': 'GET - List available LLM models'
-        },
-        'documentation': {
-            'query': {
-                'method': 'POST',
-                'body': {
-                    'prompt': 'Your question here',
-                    'model': f'model name (optional, defaults to {LLM_MODEL if LLM_PROVIDER != "local" else OLLAMA_MODEL})'
-                }
+INDEX_RESPONSE = prebuilt_json({
+    'name': 'LLM Dispatcher',
+    'version': '1.0',
+    'provider': LLM_PROVIDER,
+    'endpoints': {
+        '/health': 'GET - Health check',
+        '/query': 'POST - Direct LLM query',
+        '/models': 'GET - List available LLM models'
+    },
+    'documentation': {
+        'query': {
+            'method': 'POST',
+            'body': {
+                'prompt': 'Your question here',
+                'model': f'model name (optional, defaults to {LLM_MODEL if LLM_PROVIDER != "local" else OLLAMA_MODEL})',
+                'stream': 'true to receive server-sent events as tokens are generated (optional)'
             }
         }
-    })
+    }
+})
+
+
+@app.get('/')
+async def index(request: Request):
+    """API documentation"""
+    return static_json_response(request, INDEX_RESPONSE)
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5100, debug=True)
\ No newline at end of file
+    # Local development entrypoint; the container runs uvicorn with workers
+    import uvicorn
+    reload = os.getenv('UVICORN_RELOAD', 'False').lower() in ('true', '1', 'yes')
+    uvicorn.run('app:app', host='0.0.0.0', port=5100, reload=reload)
\ No newline at end of file
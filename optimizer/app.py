@@ -1,57 +1,183 @@
+import asyncio
+import json
 import logging
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from functools import wraps
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-import requests
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
 # Environment variables
 
 LLM_DISPATCHER = os.getenv("LLM_DISPATCHER", "llm-dispatcher")
 LLM_DISPATCHER_PORT = int(os.getenv("LLM_DISPATCHER_PORT", "5100"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "50"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "5"))
+# Upper bound on how much of a failed dispatcher response is read for logging
+MAX_ERROR_BODY_BYTES = 2048
+
+# Shared async HTTP client, created once per worker in the lifespan handler
+http_client: Optional[httpx.AsyncClient] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared HTTP client on startup and close it on shutdown"""
+    global http_client
+    # Keep-alive pool to the dispatcher; connection failures are retried
+    # before surfacing as errors
+    http_client = httpx.AsyncClient(
+        timeout=60,
+        transport=httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=30,
+            ),
+            retries=HTTP_RETRIES,
+        ),
+    )
+    yield
+    await http_client.aclose()
+
+
+# Initialize FastAPI app
+app = FastAPI(title="Optimizer", lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,  # Enable CORS for all routes
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+async def read_json(request: Request) -> Optional[Dict[str, Any]]:
+    """Parse the request body as JSON, returning None if it is missing or invalid"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def read_error_body(response: httpx.Response) -> str:
+    """Read at most MAX_ERROR_BODY_BYTES of a streamed error response"""
+    body = b""
+    async for chunk in response.aiter_bytes():
+        body += chunk
+        if len(body) >= MAX_ERROR_BODY_BYTES:
+            break
+    return body[:MAX_ERROR_BODY_BYTES].decode("utf-8", errors="replace")
+
+
+class TTLProbe:
+    """
+    Cache the result of an async health probe for a short TTL
+
+    Concurrent callers share a single in-flight probe, and failures are cached
+    like successes so a downed service is not re-probed on every request.
+    """
+
+    def __init__(self, probe, ttl: float):
+        self.probe = probe
+        self.ttl = ttl
+        self.value = None
+        self.expires_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def __call__(self):
+        if time.monotonic() < self.expires_at:
+            return self.value
+        async with self.lock:
+            # Another caller may have refreshed the value while we waited
+            if time.monotonic() < self.expires_at:
+                return self.value
+            self.value = await self.probe()
+            self.expires_at = time.monotonic() + self.ttl
+            return self.value
+
+
+def ttl_cached(ttl: float):
+    """Decorator wrapping an async probe in a TTLProbe"""
+
+    def decorator(probe):
+        return TTLProbe(probe, ttl)
+
+    return decorator
+
+
+@ttl_cached(HEALTH_CACHE_TTL)
+async def check_dispatcher() -> str:
+    """Probe the llm dispatcher health endpoint"""
+    try:
+        response = await http_client.get(
+            f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/health", timeout=2
+        )
+        result = response.json()
+        return "up" if result["status"] == "healthy" else "down"
+    except Exception:
+        return "down"
 
 
-@app.route("/health", methods=["GET"])
-def health_check():
+@app.get("/health")
+async def health_check():
     """Health check endpoint"""
     health_status = {
         "status": "healthy",
         "services": {"llm_dispatcher": "up", "optimizer": "up"},
     }
     # Check llm dispatcher
-    try:
-        response = requests.get(
-            f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/health", timeout=2
-        )
-        result = response.json()
-        if result["status"] != "healthy":
-            health_status["status"] = "degraded"
-            health_status["services"]["llm_dispatcher"] = "down"
-
-    except Exception as e:
+    if await check_dispatcher() == "down":
         health_status["status"] = "degraded"
         health_status["services"]["llm_dispatcher"] = "down"
-    return jsonify(health_status)
+    return health_status
 
 
-@app.route("/query", methods=["POST"])
-def optimize_query():
+async def relay_dispatcher_stream(prompt: str) -> AsyncIterator[bytes]:
+    """Pass the dispatcher's server-sent events through unchanged"""
+    try:
+        async with http_client.stream(
+            "POST",
+            f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/query",
+            json={"prompt": prompt, "stream": True},
+        ) as response:
+            if response.status_code != 200:
+                error_text = await read_error_body(response)
+                logger.error(
+                    f"LLM dispatcher returned status {response.status_code}: {error_text}"
+                )
+                yield b"data: " + json.dumps(
+                    {
+                        "error": f"LLM dispatcher returned status {response.status_code}: {error_text}"
+                    }
+                ).encode() + b"\n\n"
+                return
+            async for chunk in response.aiter_raw():
+                yield chunk
+    except httpx.HTTPError as e:
+        yield b"data: " + json.dumps(
+            {"error": f"Failed to query LLM dispatcher: {str(e)}"}
+        ).encode() + b"\n\n"
+
+
+@app.post("/query")
+async def optimize_query(request: Request):
     """Requesting to llm dispatcher"""
-    data = request.json
+    data = await read_json(request)
 
     if not data or "query" not in data:
-        return jsonify({"error": "Missing prompt in request body"}), 400
+        return JSONResponse({"error": "Missing prompt in request body"}, status_code=400)
 
     query = data["query"]
 
@@ -63,23 +189,59 @@ def optimize_query():
         "querying llm dispatcher",
         f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/query",
     )
-    result = requests.post(
-        f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/query",
-        json={"prompt": optimized_query},
-    )
-    result = result.json()
+    if data.get("stream"):
+        return StreamingResponse(
+            relay_dispatcher_stream(optimized_query),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+    try:
+        async with http_client.stream(
+            "POST",
+            f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/query",
+            json={"prompt": optimized_query},
+        ) as response:
+            if response.status_code != 200:
+                error_text = await read_error_body(response)
+                logger.error(
+                    f"LLM dispatcher returned status {response.status_code}: {error_text}"
+                )
+                return JSONResponse(
+                    {
+                        "error": f"LLM dispatcher returned status {response.status_code}: {error_text}"
+                    },
+                    status_code=500,
+                )
+            await response.aread()
+            result = response.json()
+    except httpx.TimeoutException:
+        return JSONResponse(
+            {"error": "Request to LLM dispatcher timed out"}, status_code=500
+        )
+    except httpx.HTTPError as e:
+        return JSONResponse(
+            {"error": f"Failed to query LLM dispatcher: {str(e)}"}, status_code=500
+        )
+    except ValueError:
+        return JSONResponse(
+            {"error": "LLM dispatcher returned invalid JSON"}, status_code=500
+        )
     print("result is ", result)
     if "error" in result:
-        return jsonify(result), 500
+        return JSONResponse(result, status_code=500)
 
-    return jsonify({"response": result.get("response", "")})
+    return {"response": result.get("response", "")}
 
 
-@app.route("/", methods=["GET"])
-def index():
+@app.get("/")
+async def index():
     """API documentation"""
-    return jsonify({"message": "Optimizer API is running"})
+    return {"message": "Optimizer API is running"}
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5050, debug=True)
+    # Local development entrypoint; the container runs uvicorn with workers
+    import uvicorn
+
+    reload = os.getenv("UVICORN_RELOAD", "False").lower() in ("true", "1", "yes")
+    uvicorn.run("app:app", host="0.0.0.0", port=5050, reload=reload)
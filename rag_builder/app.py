@@ -16,38 +16,84 @@ Author: Recurser Team
 Version: 2.0 (Production)
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import requests
 import os
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import logging
 import re
 import uuid
-from datetime import datetime, timedelta
+import hashlib
+import queue
+from collections import OrderedDict
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from datetime import datetime, timezone
 
 # Configure logging first
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
+# Keep HF tokenizers from spawning its own thread pool inside gunicorn's threads
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
 # RAG-specific imports
 try:
     import tiktoken
     import numpy as np
+    import torch
     from sentence_transformers import SentenceTransformer
     import chromadb
+    from chromadb.config import Settings
     DEPENDENCIES_AVAILABLE = True
 except ImportError as e:
     logger.error(f"Missing RAG dependencies: {e}")
     DEPENDENCIES_AVAILABLE = False
 
+# Optional streaming JSON parser for large /embed bodies
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Optional fast JSON serializer for API responses
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, so jsonify() output skips stdlib json"""
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+    
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        # Hand orjson's bytes to the response directly instead of via a str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+            mimetype='application/json'
+        )
+
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 
 # Environment variables
 CHROMA_HOST = os.getenv('CHROMA_HOST', 'localhost')
 CHROMA_PORT = int(os.getenv('CHROMA_PORT', '8000'))
+CHROMA_HTTP_MAX_CONNECTIONS = int(os.getenv('CHROMA_HTTP_MAX_CONNECTIONS', '32'))
+CHROMA_HTTP_MAX_KEEPALIVE = int(os.getenv('CHROMA_HTTP_MAX_KEEPALIVE', '16'))
 
 # RAG Configuration
 CHUNK_TARGET_TOKENS = int(os.getenv('CHUNK_TARGET_TOKENS', '512'))
@@ -55,33 +101,93 @@ CHUNK_MIN_TOKENS = int(os.getenv('CHUNK_MIN_TOKENS', '100'))
 CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', '800'))
 CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', '50'))
 EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+EMBEDDING_DEVICE = os.getenv('EMBEDDING_DEVICE') or None  # e.g. 'cuda'; auto-detected when unset
+EMBEDDING_FP16 = os.getenv('EMBEDDING_FP16', 'False').lower() in ('true', '1', 'yes')
+# dtype document embeddings are held in between encoding and storage ('float16' or 'float32')
+EMBEDDING_STORAGE_DTYPE = os.getenv('EMBEDDING_STORAGE_DTYPE', 'float16')
+# Torch intra-op threads per worker on CPU; 0 splits the cores across WEB_CONCURRENCY workers
+TORCH_NUM_THREADS = int(os.getenv('TORCH_NUM_THREADS', '0'))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '1024'))
+EMBEDDING_MAX_BATCH = int(os.getenv('EMBEDDING_MAX_BATCH', '32'))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_WAIT_MS', '20'))
+SIMILARITY_CACHE_SIZE = int(os.getenv('SIMILARITY_CACHE_SIZE', '256'))
+SIMILARITY_CACHE_THRESHOLD = float(os.getenv('SIMILARITY_CACHE_THRESHOLD', '0.95'))
+# Retrieval caches are per worker and invalidation only reaches the worker that
+# handled the /embed or delete, so other workers can serve results that are
+# stale by up to the TTL. Keep it short; raise it only for mostly-static sessions.
+SIMILARITY_CACHE_TTL = float(os.getenv('SIMILARITY_CACHE_TTL', '10'))
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '2000'))
+QUERY_CACHE_TTL = float(os.getenv('QUERY_CACHE_TTL', '10'))
+MAX_BATCH_QUERIES = int(os.getenv('MAX_BATCH_QUERIES', '32'))
+MAX_BATCH_DOCUMENTS = int(os.getenv('MAX_BATCH_DOCUMENTS', '16'))
 SESSION_CLEANUP_HOURS = int(os.getenv('SESSION_CLEANUP_HOURS', '24'))
+CHROMA_ADD_BATCH_SIZE = int(os.getenv('CHROMA_ADD_BATCH_SIZE', '250'))
+CHROMA_ADD_WORKERS = int(os.getenv('CHROMA_ADD_WORKERS', '4'))
+
+# Precompiled patterns used on the ingest path
+_SENT_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+_COLLECTION_NAME_RE = re.compile(r'[^a-zA-Z0-9_-]')
 
 # Initialize global components
-embedding_model = None
-tokenizer = None
 chroma_client = None
 
-if DEPENDENCIES_AVAILABLE:
+@lru_cache(maxsize=1)
+def get_embedding_model():
+    """
+    Load the embedding model on first use, once per worker process
+    
+    Loading lazily keeps the model (and any CUDA context) out of the gunicorn
+    master, so forked workers never inherit it. A failed load is cached as None.
+    """
+    if not DEPENDENCIES_AVAILABLE:
+        return None
+    
     try:
         logger.info(f"Loading embedding model: {EMBEDDING_MODEL_NAME}")
-        embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-        tokenizer = tiktoken.get_encoding("cl100k_base")  # GPT-3.5/4 tokenizer
-        
-        # Initialize ChromaDB client
+        model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=EMBEDDING_DEVICE)
+        if model.device.type == 'cuda':
+            if EMBEDDING_FP16:
+                model.half()
+        else:
+            # Avoid oversubscribing cores when several workers encode at once
+            workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+            torch.set_num_threads(TORCH_NUM_THREADS or max(1, (os.cpu_count() or 1) // workers))
+        return model
+    except Exception as e:
+        logger.error(f"Failed to load embedding model: {e}")
+        return None
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    """Load the tiktoken encoder on first use, once per worker process"""
+    if not DEPENDENCIES_AVAILABLE:
+        return None
+    
+    try:
+        return tiktoken.get_encoding("cl100k_base")  # GPT-3.5/4 tokenizer
+    except Exception as e:
+        logger.error(f"Failed to load tokenizer: {e}")
+        return None
+
+if DEPENDENCIES_AVAILABLE:
+    try:
+        # Initialize ChromaDB client with a pooled keep-alive HTTP connection set
         logger.info(f"Connecting to ChromaDB at {CHROMA_HOST}:{CHROMA_PORT}")
         chroma_client = chromadb.HttpClient(
             host=CHROMA_HOST,
-            port=CHROMA_PORT
+            port=CHROMA_PORT,
+            settings=Settings(
+                chroma_http_max_connections=CHROMA_HTTP_MAX_CONNECTIONS,
+                chroma_http_max_keepalive_connections=CHROMA_HTTP_MAX_KEEPALIVE
+            )
         )
         
         # Test connection
         chroma_client.heartbeat()
-        logger.info("RAG components initialized successfully")
+        logger.info("ChromaDB client initialized successfully")
     except Exception as e:
-        logger.error(f"Failed to initialize RAG components: {e}")
-        embedding_model = None
-        tokenizer = None
+        logger.error(f"Failed to initialize ChromaDB client: {e}")
         chroma_client = None
 
 # ================================
@@ -90,6 +196,7 @@ if DEPENDENCIES_AVAILABLE:
 
 def count_tokens(text: str) -> int:
     """Count tokens in text using tiktoken"""
+    tokenizer = get_tokenizer()
     if not tokenizer:
         # Fallback: approximate token count (1 token ≈ 4 characters)
         return len(text) // 4
@@ -100,11 +207,101 @@ def count_tokens(text: str) -> int:
         logger.warning(f"Token counting failed, using approximation: {e}")
         return len(text) // 4
 
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    """Count tokens for many texts in a single tiktoken batch call"""
+    tokenizer = get_tokenizer()
+    if not tokenizer:
+        return [len(text) // 4 for text in texts]
+    
+    try:
+        return [len(ids) for ids in tokenizer.encode_ordinary_batch(texts)]
+    except Exception as e:
+        logger.warning(f"Batch token counting failed, using approximation: {e}")
+        return [len(text) // 4 for text in texts]
+
 def split_into_sentences(text: str) -> List[str]:
     """Split text into sentences for boundary preservation"""
     # Simple sentence splitting - could be enhanced with NLTK/spaCy
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    return [s.strip() for s in sentences if s.strip()]
+    return [s for s in (s.strip() for s in _SENT_SPLIT_RE.split(text.strip())) if s]
+
+def take_overlap_ids(token_ids: List[int], overlap_tokens: int) -> List[int]:
+    """Return at most overlap_tokens trailing token ids, starting on a word boundary"""
+    tokenizer = get_tokenizer()
+    tail = token_ids[-overlap_tokens:]
+    for start, token in enumerate(tail):
+        if tokenizer.decode_single_token_bytes(token)[:1].isspace():
+            return tail[start:]
+    return tail
+
+def split_long_sentence(
+    sentence: str,
+    target_tokens: int,
+    min_tokens: int,
+    chunks: List[str],
+    chunk_token_counts: List[int]
+):
+    """Split a sentence longer than max_tokens by words, appending the pieces"""
+    words = sentence.split()
+    word_lengths = count_tokens_batch([" " + word for word in words])
+    word_chunk: List[str] = []
+    word_chunk_tokens = 0
+    
+    for word, word_tokens in zip(words, word_lengths):
+        if word_chunk_tokens + word_tokens > target_tokens and word_chunk:
+            if word_chunk_tokens >= min_tokens:
+                chunks.append(" ".join(word_chunk))
+                chunk_token_counts.append(word_chunk_tokens)
+            word_chunk = [word]
+            word_chunk_tokens = word_tokens
+        else:
+            word_chunk.append(word)
+            word_chunk_tokens += word_tokens
+    
+    if word_chunk and word_chunk_tokens >= min_tokens:
+        chunks.append(" ".join(word_chunk))
+        chunk_token_counts.append(word_chunk_tokens)
+
+def take_overlap_text(text: str, overlap_tokens: int) -> str:
+    """Return roughly overlap_tokens trailing characters of text, starting on a word boundary"""
+    tail = text[-overlap_tokens * 4:]
+    if len(tail) < len(text) and not text[-len(tail) - 1].isspace():
+        # Drop the partial word at the start of the window
+        tail = tail.partition(" ")[2]
+    return tail.strip()
+
+def chunk_sentences_approx(
+    sentences: List[str],
+    target_tokens: int,
+    overlap_tokens: int,
+    min_tokens: int,
+    max_tokens: int
+) -> Tuple[List[str], List[int]]:
+    """Sentence boundary chunking with approximate counts (1 token ≈ 4 characters)"""
+    chunks: List[str] = []
+    chunk_token_counts: List[int] = []
+    current_chunk = ""
+    
+    for sentence in sentences:
+        if len(sentence) // 4 > max_tokens:
+            split_long_sentence(sentence, target_tokens, min_tokens, chunks, chunk_token_counts)
+            continue
+        
+        candidate = current_chunk + " " + sentence if current_chunk else sentence
+        if len(candidate) // 4 > target_tokens and current_chunk:
+            if len(current_chunk) // 4 >= min_tokens:
+                chunks.append(current_chunk)
+                chunk_token_counts.append(len(current_chunk) // 4)
+            
+            overlap = take_overlap_text(current_chunk, overlap_tokens) if overlap_tokens > 0 and chunks else ""
+            current_chunk = overlap + " " + sentence if overlap else sentence
+        else:
+            current_chunk = candidate
+    
+    if current_chunk and len(current_chunk) // 4 >= min_tokens:
+        chunks.append(current_chunk)
+        chunk_token_counts.append(len(current_chunk) // 4)
+    
+    return chunks, chunk_token_counts
 
 def chunk_text_with_overlap(
     text: str, 
@@ -112,7 +309,7 @@ def chunk_text_with_overlap(
     overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
     min_tokens: int = CHUNK_MIN_TOKENS,
     max_tokens: int = CHUNK_MAX_TOKENS
-) -> List[str]:
+) -> Tuple[List[str], List[int]]:
     """
     Chunk text into overlapping segments with sentence boundary preservation
     
@@ -124,90 +321,132 @@ def chunk_text_with_overlap(
         max_tokens: Maximum chunk size (hard limit)
     
     Returns:
-        List of text chunks
+        List of text chunks and the token count of each chunk
     """
     if not text.strip():
-        return []
+        return [], []
     
     # Split into sentences for boundary preservation
     sentences = split_into_sentences(text)
     if not sentences:
-        return []
+        return [], []
+    
+    tokenizer = get_tokenizer()
+    if not tokenizer:
+        chunks, chunk_token_counts = chunk_sentences_approx(
+            sentences, target_tokens, overlap_tokens, min_tokens, max_tokens
+        )
+        logger.info(f"Chunked text into {len(chunks)} chunks (approximate token counts)")
+        return chunks, chunk_token_counts
+    
+    # Tokenize every sentence once up front. The leading space matches how
+    # sentences are joined, so concatenated ids decode back to the same text.
+    sentence_ids = tokenizer.encode_ordinary_batch([" " + s for s in sentences])
     
     chunks = []
-    current_chunk = ""
-    current_tokens = 0
+    chunk_token_counts = []
+    current_ids: List[int] = []
     
-    i = 0
-    while i < len(sentences):
-        sentence = sentences[i]
-        sentence_tokens = count_tokens(sentence)
-        
+    for sentence, ids in zip(sentences, sentence_ids):
         # If single sentence exceeds max_tokens, split it by words
-        if sentence_tokens > max_tokens:
-            words = sentence.split()
-            word_chunk = ""
-            
-            for word in words:
-                word_tokens = count_tokens(word_chunk + " " + word)
-                if word_tokens > target_tokens and word_chunk:
-                    if count_tokens(word_chunk) >= min_tokens:
-                        chunks.append(word_chunk.strip())
-                    word_chunk = word
-                else:
-                    word_chunk += " " + word if word_chunk else word
-            
-            if word_chunk and count_tokens(word_chunk) >= min_tokens:
-                chunks.append(word_chunk.strip())
-            
-            i += 1
+        if len(ids) > max_tokens:
+            split_long_sentence(sentence, target_tokens, min_tokens, chunks, chunk_token_counts)
             continue
         
         # Check if adding this sentence would exceed target
-        potential_tokens = current_tokens + sentence_tokens
-        
-        if potential_tokens > target_tokens and current_chunk:
+        if len(current_ids) + len(ids) > target_tokens and current_ids:
             # Save current chunk if it meets minimum size
-            if current_tokens >= min_tokens:
-                chunks.append(current_chunk.strip())
+            if len(current_ids) >= min_tokens:
+                chunks.append(tokenizer.decode(current_ids).strip())
+                chunk_token_counts.append(len(current_ids))
             
-            # Start new chunk with overlap
+            # Start new chunk with overlap from the tail of the previous chunk
             if overlap_tokens > 0 and chunks:
-                # Create overlap by taking last part of previous chunk
-                overlap_text = current_chunk
-                overlap_token_count = count_tokens(overlap_text)
-                
-                # Trim overlap to desired size
-                if overlap_token_count > overlap_tokens:
-                    words = overlap_text.split()
-                    overlap_text = ""
-                    for word in reversed(words):
-                        test_text = word + " " + overlap_text if overlap_text else word
-                        if count_tokens(test_text) <= overlap_tokens:
-                            overlap_text = test_text
-                        else:
-                            break
-                
-                current_chunk = overlap_text + " " + sentence if overlap_text else sentence
-                current_tokens = count_tokens(current_chunk)
+                current_ids = take_overlap_ids(current_ids, overlap_tokens) + ids
             else:
-                current_chunk = sentence
-                current_tokens = sentence_tokens
+                current_ids = list(ids)
         else:
             # Add sentence to current chunk
-            current_chunk += " " + sentence if current_chunk else sentence
-            current_tokens = potential_tokens
-        
-        i += 1
+            current_ids.extend(ids)
     
     # Add final chunk if it meets minimum size
-    if current_chunk and current_tokens >= min_tokens:
-        chunks.append(current_chunk.strip())
+    if current_ids and len(current_ids) >= min_tokens:
+        chunks.append(tokenizer.decode(current_ids).strip())
+        chunk_token_counts.append(len(current_ids))
     
-    logger.info(f"Chunked text into {len(chunks)} chunks (avg {sum(count_tokens(c) for c in chunks) // len(chunks) if chunks else 0} tokens)")
-    return chunks
+    logger.info(f"Chunked text into {len(chunks)} chunks (avg {sum(chunk_token_counts) // len(chunks) if chunks else 0} tokens)")
+    return chunks, chunk_token_counts
+
+class EmbeddingBatcher:
+    """
+    Funnel encode calls from all request threads through one worker thread
+    
+    The worker owns the model and waits up to batch_wait_timeout_s for at most
+    max_batch_size texts, then encodes them in a single call instead of letting
+    request threads contend for the model. Each caller blocks on its own future.
+    The thread is started on first use so it only ever exists in forked workers.
+    """
+    
+    def __init__(self, max_batch_size: int, batch_wait_timeout_s: float):
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_wait_timeout_s = batch_wait_timeout_s
+        self.queue: "queue.Queue[tuple]" = queue.Queue()
+        self.worker: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+    
+    def encode(self, texts: List[str]) -> "np.ndarray":
+        """Queue texts for encoding and wait for their normalized float32 embeddings"""
+        if self.worker is None:
+            with self.lock:
+                if self.worker is None:
+                    self.worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self.worker.start()
+        
+        future: Future = Future()
+        self.queue.put((texts, future))
+        return future.result()
+    
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            batch_texts = len(batch[0][0])
+            deadline = time.monotonic() + self.batch_wait_timeout_s
+            while batch_texts < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                batch_texts += len(item[0])
+            self._run_batch(batch)
+    
+    def _run_batch(self, batch: List[tuple]):
+        texts = [text for item_texts, _ in batch for text in item_texts]
+        try:
+            embeddings = get_embedding_model().encode(
+                texts,
+                batch_size=EMBEDDING_BATCH_SIZE,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        
+        # Hand each caller its own slice of the combined result
+        offset = 0
+        for item_texts, future in batch:
+            future.set_result(embeddings[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+
+embedding_batcher = EmbeddingBatcher(EMBEDDING_MAX_BATCH, EMBEDDING_BATCH_WAIT_MS / 1000)
 
-def generate_embeddings(texts: List[str]) -> Optional[List[List[float]]]:
+def generate_embeddings(texts: List[str]) -> Optional["np.ndarray"]:
     """
     Generate embeddings for a list of texts
     
@@ -215,23 +454,73 @@ def generate_embeddings(texts: List[str]) -> Optional[List[List[float]]]:
         texts: List of text strings to embed
     
     Returns:
-        List of embedding vectors or None if failed
+        L2-normalized array of shape (len(texts), dim) in EMBEDDING_STORAGE_DTYPE
+        or None if failed
     """
-    if not embedding_model:
+    if not get_embedding_model():
         logger.error("Embedding model not available")
         return None
     
     if not texts:
-        return []
+        return np.empty((0, 0), dtype=EMBEDDING_STORAGE_DTYPE)
     
     try:
         logger.info(f"Generating embeddings for {len(texts)} texts")
-        embeddings = embedding_model.encode(texts, convert_to_numpy=True)
-        return embeddings.tolist()
+        embeddings = embedding_batcher.encode(texts)
+        # Unit vectors lose negligible recall in fp16 and take half the memory
+        return embeddings.astype(EMBEDDING_STORAGE_DTYPE, copy=False)
     except Exception as e:
         logger.error(f"Failed to generate embeddings: {e}")
         return None
 
+def build_chunk_columns(
+    chunks: List[str],
+    chunk_token_counts: List[int],
+    embeddings: "np.ndarray",
+    session_id: str,
+    source_url: str,
+    document_title: str = ""
+) -> Dict[str, Any]:
+    """
+    Build the parallel chunk columns and summary for one embedded document
+    
+    chunk_token_counts are the counts the chunker measured, so chunks are
+    not tokenized a second time.
+    """
+    token_counts = np.asarray(chunk_token_counts, dtype=np.int32)
+    total_tokens = int(token_counts.sum())
+    ids = [f"{source_url}_{i}_{uuid.uuid4().hex[:8]}" for i in range(len(chunks))]
+    # All chunks of a document share one ingest time
+    created_at = datetime.now(timezone.utc).isoformat()
+    metadatas = [
+        {
+            "session_id": session_id,
+            "source_url": source_url,
+            "chunk_index": i,
+            "chunk_id": chunk_id,
+            "document_title": document_title,
+            "token_count": int(token_counts[i]),
+            "created_at": created_at
+        }
+        for i, chunk_id in enumerate(ids)
+    ]
+    
+    return {
+        "chunks": {
+            "ids": ids,
+            "contents": chunks,
+            "embeddings": embeddings,
+            "token_counts": token_counts,
+            "metadatas": metadatas
+        },
+        "summary": {
+            "total_chunks": len(chunks),
+            "total_tokens": total_tokens,
+            "average_chunk_size": total_tokens // len(chunks),
+            "embedding_dimensions": embeddings.shape[1] if len(embeddings) else 0
+        }
+    }
+
 def process_document_for_rag(
     content: str,
     session_id: str,
@@ -248,14 +537,15 @@ def process_document_for_rag(
         document_title: Optional document title
     
     Returns:
-        Processed chunks with embeddings and metadata
+        Processed chunks as parallel columns (ids, contents, embeddings,
+        token_counts, metadatas) plus a processing summary
     """
     if not content.strip():
         return {"error": "Empty content provided", "chunks": []}
     
     try:
         # Step 1: Chunk the content
-        chunks = chunk_text_with_overlap(content)
+        chunks, chunk_token_counts = chunk_text_with_overlap(content)
         
         if not chunks:
             return {"error": "No valid chunks created", "chunks": []}
@@ -266,36 +556,8 @@ def process_document_for_rag(
         if embeddings is None:
             return {"error": "Failed to generate embeddings", "chunks": []}
         
-        # Step 3: Create chunk objects with metadata
-        processed_chunks = []
-        for i, (chunk_text, embedding) in enumerate(zip(chunks, embeddings)):
-            chunk_id = f"{source_url}_{i}_{uuid.uuid4().hex[:8]}"
-            
-            chunk_obj = {
-                "chunk_id": chunk_id,
-                "content": chunk_text,
-                "embedding": embedding,
-                "metadata": {
-                    "session_id": session_id,
-                    "source_url": source_url,
-                    "chunk_index": i,
-                    "chunk_id": chunk_id,
-                    "document_title": document_title,
-                    "token_count": count_tokens(chunk_text),
-                    "created_at": datetime.utcnow().isoformat()
-                }
-            }
-            processed_chunks.append(chunk_obj)
-        
-        result = {
-            "chunks": processed_chunks,
-            "summary": {
-                "total_chunks": len(processed_chunks),
-                "total_tokens": sum(count_tokens(chunk) for chunk in chunks),
-                "average_chunk_size": sum(count_tokens(chunk) for chunk in chunks) // len(chunks),
-                "embedding_dimensions": len(embeddings[0]) if embeddings else 0
-            }
-        }
+        # Step 3: Build parallel chunk columns (struct-of-arrays)
+        result = build_chunk_columns(chunks, chunk_token_counts, embeddings, session_id, source_url, document_title)
         
         logger.info(f"Successfully processed document: {len(chunks)} chunks, {result['summary']['total_tokens']} tokens")
         return result
@@ -304,7 +566,88 @@ def process_document_for_rag(
         logger.error(f"Error processing document: {e}")
         return {"error": f"Document processing failed: {str(e)}", "chunks": []}
 
-def generate_query_embedding(query: str) -> Optional[List[float]]:
+def process_documents_for_rag(documents: List[Dict[str, str]], session_id: str) -> Dict[str, Any]:
+    """
+    Process several documents: chunk each, then embed all chunks at once
+    
+    Args:
+        documents: Dicts with content, source_url and optional title
+        session_id: Session identifier
+    
+    Returns:
+        The chunks of every document as one set of parallel columns, a
+        per-document summary list (in input order) and overall totals
+    """
+    try:
+        # Step 1: Chunk every document
+        chunked = []
+        summaries = []
+        for document in documents:
+            chunks, chunk_token_counts = chunk_text_with_overlap(document["content"])
+            if not chunks:
+                summaries.append({"source_url": document["source_url"], "error": "No valid chunks created"})
+                continue
+            chunked.append((document, chunks, chunk_token_counts, len(summaries)))
+            summaries.append(None)
+        
+        if not chunked:
+            return {"error": "No valid chunks created", "chunks": []}
+        
+        # Step 2: One embedding pass over the chunks of all documents
+        all_chunks = [chunk for _, chunks, _, _ in chunked for chunk in chunks]
+        embeddings = generate_embeddings(all_chunks)
+        
+        if embeddings is None:
+            return {"error": "Failed to generate embeddings", "chunks": []}
+        
+        # Step 3: Build each document's columns, then join them
+        columns = {"ids": [], "contents": [], "embeddings": [], "token_counts": [], "metadatas": []}
+        offset = 0
+        for document, chunks, chunk_token_counts, position in chunked:
+            result = build_chunk_columns(
+                chunks,
+                chunk_token_counts,
+                embeddings[offset:offset + len(chunks)],
+                session_id,
+                document["source_url"],
+                document.get("title", "")
+            )
+            offset += len(chunks)
+            for key, values in result["chunks"].items():
+                columns[key].append(values)
+            summaries[position] = {"source_url": document["source_url"], **result["summary"]}
+        
+        for key in ("ids", "contents", "metadatas"):
+            columns[key] = [value for values in columns[key] for value in values]
+        columns["embeddings"] = np.concatenate(columns["embeddings"])
+        columns["token_counts"] = np.concatenate(columns["token_counts"])
+        
+        total_tokens = int(columns["token_counts"].sum())
+        logger.info(f"Successfully processed {len(chunked)} documents: {len(all_chunks)} chunks, {total_tokens} tokens")
+        return {
+            "chunks": columns,
+            "documents": summaries,
+            "summary": {
+                "total_documents": len(chunked),
+                "total_chunks": len(all_chunks),
+                "total_tokens": total_tokens,
+                "embedding_dimensions": embeddings.shape[1]
+            }
+        }
+        
+    except Exception as e:
+        logger.error(f"Error processing documents: {e}")
+        return {"error": f"Document processing failed: {str(e)}", "chunks": []}
+
+@lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+def _cached_query_embedding(normalized_query: str) -> "np.ndarray":
+    """Embed a normalized query, memoizing repeated searches"""
+    embedding = embedding_batcher.encode([normalized_query])[0]
+    # Shared between callers, so make sure nobody mutates the cached vector
+    embedding.flags.writeable = False
+    return embedding
+
+def generate_query_embedding(query: str) -> Optional["np.ndarray"]:
     """
     Generate embedding for a search query
     
@@ -312,9 +655,9 @@ def generate_query_embedding(query: str) -> Optional[List[float]]:
         query: Search query text
     
     Returns:
-        Query embedding vector or None if failed
+        Read-only normalized float32 query vector or None if failed
     """
-    if not embedding_model:
+    if not get_embedding_model():
         logger.error("Embedding model not available")
         return None
     
@@ -323,8 +666,8 @@ def generate_query_embedding(query: str) -> Optional[List[float]]:
         return None
     
     try:
-        embedding = embedding_model.encode([query.strip()], convert_to_numpy=True)
-        return embedding[0].tolist()
+        # The default MiniLM model is uncased, so case and whitespace variants share an entry
+        return _cached_query_embedding(" ".join(query.lower().split()))
     except Exception as e:
         logger.error(f"Failed to generate query embedding: {e}")
         return None
@@ -333,12 +676,68 @@ def generate_query_embedding(query: str) -> Optional[List[float]]:
 # CHROMADB INTEGRATION FUNCTIONS
 # ================================
 
+@lru_cache(maxsize=4096)
 def get_collection_name(session_id: str) -> str:
     """Generate collection name for session"""
     # Sanitize session_id for ChromaDB collection naming
-    sanitized_id = re.sub(r'[^a-zA-Z0-9_-]', '_', session_id)
+    sanitized_id = _COLLECTION_NAME_RE.sub('_', session_id)
     return f"session_{sanitized_id}"
 
+# Serializes collection creation so concurrent /embed calls for a new
+# session don't race each other into create_collection
+collection_create_lock = threading.Lock()
+
+# Shared pool for concurrent ChromaDB sub-batch inserts; threads start on first use
+chroma_add_executor = ThreadPoolExecutor(max_workers=max(1, CHROMA_ADD_WORKERS), thread_name_prefix="chroma-add")
+
+# Collection handles by name, so repeat calls skip the get_collection round-trip.
+# A handle is dropped when its collection is deleted or an operation on it fails;
+# callers then retry once with a fresh handle, since another worker may have
+# deleted or recreated the collection.
+collection_handles: Dict[str, Any] = {}
+collection_handles_lock = threading.Lock()
+
+def get_cached_collection(collection_name: str):
+    """Return a cached collection handle, fetching it from ChromaDB on a miss"""
+    with collection_handles_lock:
+        collection = collection_handles.get(collection_name)
+    if collection is None:
+        collection = chroma_client.get_collection(name=collection_name)
+        with collection_handles_lock:
+            collection_handles[collection_name] = collection
+    return collection
+
+def forget_collection(collection_name: str):
+    """Drop a cached collection handle"""
+    with collection_handles_lock:
+        collection_handles.pop(collection_name, None)
+
+def query_collection(collection_name: str, **query_kwargs):
+    """
+    Query a collection through its cached handle
+    
+    If the query fails, the handle may be stale, so it is fetched again and
+    the query retried once. Returns (collection, results), or None if the
+    collection no longer exists; raises if the retry fails too.
+    """
+    collection = get_cached_collection(collection_name)
+    try:
+        return collection, collection.query(**query_kwargs)
+    except Exception as e:
+        logger.warning(f"Query on {collection_name} failed, retrying with a fresh handle: {e}")
+        forget_collection(collection_name)
+    
+    try:
+        collection = get_cached_collection(collection_name)
+    except Exception:
+        logger.warning(f"Collection {collection_name} not found")
+        return None
+    try:
+        return collection, collection.query(**query_kwargs)
+    except Exception:
+        forget_collection(collection_name)
+        raise
+
 def create_or_get_collection(session_id: str):
     """Create or get existing collection for session"""
     if not chroma_client:
@@ -348,32 +747,48 @@ def create_or_get_collection(session_id: str):
     
     try:
         # Try to get existing collection
-        collection = chroma_client.get_collection(name=collection_name)
-        logger.info(f"Retrieved existing collection: {collection_name}")
-        return collection
+        return get_cached_collection(collection_name)
     except Exception:
+        pass
+    
+    with collection_create_lock:
         # Collection doesn't exist, create it
         try:
+            # Epoch seconds are what cleanup compares; the ISO strings are for people
+            created_at_epoch = int(time.time())
+            cleanup_after_epoch = created_at_epoch + SESSION_CLEANUP_HOURS * 3600
             collection = chroma_client.create_collection(
                 name=collection_name,
                 metadata={
                     "session_id": session_id,
-                    "created_at": datetime.utcnow().isoformat(),
-                    "cleanup_after": (datetime.utcnow() + timedelta(hours=SESSION_CLEANUP_HOURS)).isoformat()
+                    "created_at": datetime.fromtimestamp(created_at_epoch, timezone.utc).isoformat(),
+                    "cleanup_after": datetime.fromtimestamp(cleanup_after_epoch, timezone.utc).isoformat(),
+                    "created_at_epoch": created_at_epoch,
+                    "cleanup_after_epoch": cleanup_after_epoch,
+                    # Stored and query vectors are unit length, so cosine
+                    # similarity is a plain inner product
+                    "hnsw:space": "ip",
+                    "normalized": True
                 }
             )
             logger.info(f"Created new collection: {collection_name}")
+            with collection_handles_lock:
+                collection_handles[collection_name] = collection
             return collection
         except Exception as e:
-            logger.error(f"Failed to create collection {collection_name}: {e}")
-            raise
+            # Another thread or worker may have created it in the meantime
+            try:
+                return get_cached_collection(collection_name)
+            except Exception:
+                logger.error(f"Failed to create collection {collection_name}: {e}")
+                raise
 
-def store_chunks_in_chromadb(chunks: List[Dict[str, Any]], session_id: str) -> Dict[str, Any]:
+def store_chunks_in_chromadb(chunks: Dict[str, Any], session_id: str) -> Dict[str, Any]:
     """
     Store processed chunks in ChromaDB
     
     Args:
-        chunks: List of chunk objects with embeddings and metadata
+        chunks: Chunk columns (ids, contents, embeddings, metadatas) from process_document_for_rag
         session_id: Session identifier
     
     Returns:
@@ -382,40 +797,271 @@ def store_chunks_in_chromadb(chunks: List[Dict[str, Any]], session_id: str) -> D
     if not chroma_client:
         return {"error": "ChromaDB client not available"}
     
-    if not chunks:
+    if not chunks or not chunks.get("ids"):
         return {"error": "No chunks to store"}
     
     try:
-        # Get or create collection
-        collection = create_or_get_collection(session_id)
-        
-        # Prepare data for ChromaDB
-        ids = [chunk["chunk_id"] for chunk in chunks]
-        documents = [chunk["content"] for chunk in chunks]
-        embeddings = [chunk["embedding"] for chunk in chunks]
-        metadatas = [chunk["metadata"] for chunk in chunks]
-        
-        # Store in ChromaDB
-        collection.add(
-            ids=ids,
-            documents=documents,
-            embeddings=embeddings,
-            metadatas=metadatas
-        )
+        # Columns map directly onto ChromaDB's parallel arguments
+        ids = chunks["ids"]
+        documents = chunks["contents"]
+        # ChromaDB indexes float32 and accepts ndarrays, so hand it one
+        # contiguous float32 matrix instead of boxing every value into a list
+        embeddings = np.ascontiguousarray(chunks["embeddings"], dtype=np.float32)
+        # Re-normalize after the float16 round-trip so inner product stays exact cosine
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True).clip(min=1e-12)
+        metadatas = chunks["metadatas"]
         
-        logger.info(f"Stored {len(chunks)} chunks in collection {get_collection_name(session_id)}")
+        # Store in ChromaDB in bounded sub-batches sent concurrently; a failed
+        # batch is logged and skipped so the rest of the document still gets indexed
+        batch_size = max(1, CHROMA_ADD_BATCH_SIZE)
         
-        return {
+        def add_batch(collection, start: int):
+            end = start + batch_size
+            try:
+                collection.add(
+                    ids=ids[start:end],
+                    documents=documents[start:end],
+                    embeddings=embeddings[start:end],
+                    metadatas=metadatas[start:end]
+                )
+                return len(ids[start:end]), None
+            except Exception as e:
+                error_msg = f"Failed to store chunks {start}-{min(end, len(ids)) - 1}: {str(e)}"
+                logger.error(error_msg)
+                return 0, error_msg
+        
+        def add_all(collection):
+            starts = range(0, len(ids), batch_size)
+            if len(starts) == 1:
+                return [add_batch(collection, 0)]
+            return list(chroma_add_executor.map(lambda start: add_batch(collection, start), starts))
+        
+        outcomes = add_all(create_or_get_collection(session_id))
+        if not any(count for count, _ in outcomes):
+            # Every batch failing usually means a stale cached handle, e.g. the
+            # collection was deleted by another worker; retry once with a fresh one
+            forget_collection(get_collection_name(session_id))
+            outcomes = add_all(create_or_get_collection(session_id))
+        chunks_stored = sum(count for count, _ in outcomes)
+        batch_errors = [error for _, error in outcomes if error]
+        
+        if not chunks_stored:
+            forget_collection(get_collection_name(session_id))
+            return {"error": f"Failed to store chunks: {batch_errors[0]}"}
+        
+        invalidate_session_caches(session_id)
+        logger.info(f"Stored {chunks_stored} chunks in collection {get_collection_name(session_id)}")
+        
+        result = {
             "success": True,
-            "chunks_stored": len(chunks),
+            "chunks_stored": chunks_stored,
             "collection_name": get_collection_name(session_id),
             "session_id": session_id
         }
+        if batch_errors:
+            result["chunks_failed"] = len(ids) - chunks_stored
+            result["errors"] = batch_errors
+        return result
         
     except Exception as e:
         logger.error(f"Failed to store chunks in ChromaDB: {e}")
         return {"error": f"Failed to store chunks: {str(e)}"}
 
+class SimilarityCache:
+    """
+    LRU cache of retrieval results keyed by query-embedding similarity
+    
+    A lookup matches a cached query from the same session and retrieval
+    parameters whose embedding has cosine similarity of at least threshold
+    with the new one. Embeddings are unit length, so a single matrix-vector
+    product scores every cached entry at once.
+    """
+    
+    def __init__(self, capacity: int, threshold: float, ttl: float):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self.next_key = 0
+        self.lock = threading.RLock()
+        # Stacked view of the entries, rebuilt lazily after inserts and evictions
+        self.keys: List[int] = []
+        self.matrix = None
+        self.scopes = None
+    
+    def _rebuild(self):
+        self.keys = list(self.entries)
+        if self.keys:
+            self.matrix = np.stack([self.entries[key][2] for key in self.keys])
+            self.scopes = np.array([self.entries[key][1] for key in self.keys], dtype=object)
+        else:
+            self.matrix = None
+    
+    def get(self, session_id: str, scope: str, embedding: "np.ndarray") -> Optional[Dict[str, Any]]:
+        """Return the cached result for the closest matching query, if any"""
+        if self.capacity <= 0:
+            return None
+        
+        with self.lock:
+            if self.matrix is None:
+                self._rebuild()
+            if self.matrix is None:
+                return None
+            
+            scores = self.matrix @ embedding
+            scores[self.scopes != f"{session_id}|{scope}"] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            
+            key = self.keys[best]
+            _, _, _, result, expires_at = self.entries[key]
+            if time.monotonic() >= expires_at:
+                del self.entries[key]
+                self.matrix = None
+                return None
+            self.entries.move_to_end(key)
+            return result
+    
+    def put(self, session_id: str, scope: str, embedding: "np.ndarray", result: Dict[str, Any]):
+        """Cache a retrieval result, evicting the least recently used entry when full"""
+        if self.capacity <= 0:
+            return
+        
+        with self.lock:
+            self.entries[self.next_key] = (
+                session_id, f"{session_id}|{scope}", embedding, result, time.monotonic() + self.ttl
+            )
+            self.next_key += 1
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+            self.matrix = None
+    
+    def invalidate(self, session_id: str):
+        """Drop every cached result for a session whose documents changed"""
+        with self.lock:
+            for key in [key for key, entry in self.entries.items() if entry[0] == session_id]:
+                del self.entries[key]
+            self.matrix = None
+
+similarity_cache = SimilarityCache(SIMILARITY_CACHE_SIZE, SIMILARITY_CACHE_THRESHOLD, SIMILARITY_CACHE_TTL)
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of retrieval results for exact repeat queries
+    
+    Keys include the session, a hash of the normalized query text and the
+    retrieval parameters, so a hit needs neither the embedding model nor
+    ChromaDB. Entries expire after ttl seconds and are dropped per session
+    when that session's documents change through this worker.
+    """
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.lock = threading.RLock()
+    
+    @staticmethod
+    def make_key(session_id: str, query: str, max_results: int, similarity_threshold: float) -> tuple:
+        normalized = " ".join(query.lower().split())
+        query_hash = hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+        return (session_id, query_hash, max_results, round(similarity_threshold, 3))
+    
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            result, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return result
+    
+    def put(self, key: tuple, result: Dict[str, Any]):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (result, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def invalidate(self, session_id: str):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == session_id]:
+                del self.entries[key]
+
+query_cache = QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+def invalidate_session_caches(session_id: str):
+    """
+    Forget cached retrieval results after a session's documents change
+    
+    Only clears this worker's caches; other workers' entries age out after
+    QUERY_CACHE_TTL and SIMILARITY_CACHE_TTL.
+    """
+    query_cache.invalidate(session_id)
+    similarity_cache.invalidate(session_id)
+
+def build_retrieval_result(
+    query: str,
+    session_id: str,
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+    distances: List[float],
+    space: str,
+    max_results: int,
+    similarity_threshold: float,
+    total_chunks
+) -> Dict[str, Any]:
+    """
+    Turn one query's ChromaDB results into the retrieval response
+    
+    total_chunks is a callable so the collection is only counted when there
+    are results to report.
+    """
+    if not documents:
+        return {
+            "query": query,
+            "chunks": [],
+            "total_chunks_searched": 0,
+            "message": "No relevant chunks found"
+        }
+    
+    # Convert distances to similarity scores and apply the threshold in one
+    # vectorized pass. Inner-product and cosine distances are 1 - cos;
+    # collections created before unit-vector storage use squared L2, which
+    # for unit vectors is 2 - 2cos
+    distances = np.asarray(distances, dtype=np.float64)
+    similarities = 1.0 - (distances if space in ("ip", "cosine") else distances / 2.0)
+    keep = np.flatnonzero(similarities >= similarity_threshold)[:max_results]
+    rounded = np.round(similarities[keep], 4).tolist()
+    retrieved_chunks = [
+        {
+            "content": documents[i],
+            "similarity_score": score,
+            "metadata": metadatas[i],
+            "rank": i + 1
+        }
+        for i, score in zip(keep.tolist(), rounded)
+    ]
+    
+    logger.info(f"Retrieved {len(retrieved_chunks)} relevant chunks for query in session {session_id}")
+    
+    return {
+        "query": query,
+        "chunks": retrieved_chunks,
+        "total_chunks_searched": total_chunks(),
+        "retrieval_summary": {
+            "results_returned": len(retrieved_chunks),
+            "similarity_threshold": similarity_threshold,
+            "session_id": session_id
+        }
+    }
+
 def retrieve_relevant_chunks(
     query: str,
     session_id: str,
@@ -441,15 +1087,17 @@ def retrieve_relevant_chunks(
         return {"error": "Empty query provided"}
     
     try:
-        # Generate query embedding
-        query_embedding = generate_query_embedding(query)
-        if query_embedding is None:
-            return {"error": "Failed to generate query embedding"}
+        # Exact repeats skip both the embedding model and ChromaDB
+        cache_key = QueryCache.make_key(session_id, query, max_results, similarity_threshold)
+        cached = query_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, "query": query}
         
-        # Get collection
+        # Check the collection exists before embedding, so sessions that
+        # never stored anything don't cost a model call
         collection_name = get_collection_name(session_id)
         try:
-            collection = chroma_client.get_collection(name=collection_name)
+            get_cached_collection(collection_name)
         except Exception:
             logger.warning(f"Collection {collection_name} not found")
             return {
@@ -459,55 +1107,146 @@ def retrieve_relevant_chunks(
                 "message": "No documents found for this session"
             }
         
-        # Perform similarity search
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=max_results,
+        # Generate query embedding
+        query_vector = generate_query_embedding(query)
+        if query_vector is None:
+            return {"error": "Failed to generate query embedding"}
+        
+        # Serve near-duplicate queries without querying ChromaDB
+        cache_scope = f"{max_results}|{similarity_threshold}"
+        cached = similarity_cache.get(session_id, cache_scope, query_vector)
+        if cached is not None:
+            return {**cached, "query": query}
+        
+        # Perform similarity search; with a threshold, overfetch so enough
+        # results survive the filter to still fill max_results
+        n_results = min(max_results * 4, 100) if similarity_threshold > 0 else max_results
+        found = query_collection(
+            collection_name,
+            query_embeddings=[query_vector],
+            n_results=max(n_results, max_results),
             include=["documents", "metadatas", "distances"]
         )
-        
-        if not results["documents"] or not results["documents"][0]:
+        if found is None:
             return {
                 "query": query,
                 "chunks": [],
                 "total_chunks_searched": 0,
-                "message": "No relevant chunks found"
+                "message": "No documents found for this session"
             }
+        collection, results = found
+        
+        result = build_retrieval_result(
+            query=query,
+            session_id=session_id,
+            documents=results["documents"][0] if results["documents"] else [],
+            metadatas=results["metadatas"][0] if results["metadatas"] else [],
+            distances=results["distances"][0] if results["distances"] else [],
+            space=(collection.metadata or {}).get("hnsw:space", "l2"),
+            max_results=max_results,
+            similarity_threshold=similarity_threshold,
+            total_chunks=collection.count
+        )
+        if "message" in result:
+            return result
+        
+        similarity_cache.put(session_id, cache_scope, query_vector, result)
+        query_cache.put(cache_key, result)
+        return result
+        
+    except Exception as e:
+        logger.error(f"Failed to retrieve chunks: {e}")
+        return {"error": f"Retrieval failed: {str(e)}"}
+
+def retrieve_relevant_chunks_batch(
+    queries: List[str],
+    session_id: str,
+    max_results: int = 5,
+    similarity_threshold: float = 0.0
+) -> Dict[str, Any]:
+    """
+    Retrieve relevant chunks for several queries in one pass
+    
+    Queries not already in the result cache are embedded in a single model
+    call and searched with a single ChromaDB query.
+    
+    Args:
+        queries: Search queries
+        session_id: Session identifier
+        max_results: Maximum number of chunks to return per query
+        similarity_threshold: Minimum similarity score (0-1)
+    
+    Returns:
+        Per-query retrieval results, in the order the queries were given
+    """
+    if not chroma_client:
+        return {"error": "ChromaDB client not available"}
+    
+    if not queries or any(not query.strip() for query in queries):
+        return {"error": "Empty query provided"}
+    
+    collection_name = get_collection_name(session_id)
+    no_documents = {
+        "chunks": [],
+        "total_chunks_searched": 0,
+        "message": "No documents found for this session"
+    }
+    try:
+        # Serve exact repeats from the cache and collect the rest
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        cache_keys = [QueryCache.make_key(session_id, query, max_results, similarity_threshold) for query in queries]
+        misses = []
+        for i, (query, cache_key) in enumerate(zip(queries, cache_keys)):
+            cached = query_cache.get(cache_key)
+            if cached is not None:
+                results[i] = {**cached, "query": query}
+            else:
+                misses.append(i)
         
-        # Process results
-        retrieved_chunks = []
-        for i, (doc, metadata, distance) in enumerate(zip(
-            results["documents"][0],
-            results["metadatas"][0],
-            results["distances"][0]
-        )):
-            # Convert distance to similarity score (ChromaDB uses cosine distance)
-            similarity_score = 1.0 - distance
+        if misses:
+            try:
+                get_cached_collection(collection_name)
+            except Exception:
+                logger.warning(f"Collection {collection_name} not found")
+                for i in misses:
+                    results[i] = {"query": queries[i], **no_documents}
+                return {"session_id": session_id, "results": results}
             
-            # Apply similarity threshold
-            if similarity_score < similarity_threshold:
-                continue
+            # One forward pass for every uncached query
+            query_vectors = embedding_batcher.encode([" ".join(queries[i].lower().split()) for i in misses])
             
-            chunk_result = {
-                "content": doc,
-                "similarity_score": round(similarity_score, 4),
-                "metadata": metadata,
-                "rank": i + 1
-            }
-            retrieved_chunks.append(chunk_result)
-        
-        logger.info(f"Retrieved {len(retrieved_chunks)} relevant chunks for query in session {session_id}")
+            n_results = min(max_results * 4, 100) if similarity_threshold > 0 else max_results
+            found = query_collection(
+                collection_name,
+                query_embeddings=query_vectors,
+                n_results=max(n_results, max_results),
+                include=["documents", "metadatas", "distances"]
+            )
+            if found is None:
+                for i in misses:
+                    results[i] = {"query": queries[i], **no_documents}
+                return {"session_id": session_id, "results": results}
+            collection, search = found
+            
+            space = (collection.metadata or {}).get("hnsw:space", "l2")
+            total_chunks = lru_cache(maxsize=1)(collection.count)
+            for row, i in enumerate(misses):
+                result = build_retrieval_result(
+                    query=queries[i],
+                    session_id=session_id,
+                    documents=search["documents"][row] if search["documents"] else [],
+                    metadatas=search["metadatas"][row] if search["metadatas"] else [],
+                    distances=search["distances"][row] if search["distances"] else [],
+                    space=space,
+                    max_results=max_results,
+                    similarity_threshold=similarity_threshold,
+                    total_chunks=total_chunks
+                )
+                if "message" not in result:
+                    query_cache.put(cache_keys[i], result)
+                results[i] = result
         
-        return {
-            "query": query,
-            "chunks": retrieved_chunks,
-            "total_chunks_searched": collection.count(),
-            "retrieval_summary": {
-                "results_returned": len(retrieved_chunks),
-                "similarity_threshold": similarity_threshold,
-                "session_id": session_id
-            }
-        }
+        return {"session_id": session_id, "results": results}
         
     except Exception as e:
         logger.error(f"Failed to retrieve chunks: {e}")
@@ -532,7 +1271,7 @@ def cleanup_old_collections() -> Dict[str, Any]:
             "errors": []
         }
         
-        cutoff_time = datetime.utcnow() - timedelta(hours=SESSION_CLEANUP_HOURS)
+        cutoff_epoch = time.time() - SESSION_CLEANUP_HOURS * 3600
         
         for collection_info in all_collections:
             cleanup_summary["collections_checked"] += 1
@@ -543,18 +1282,27 @@ def cleanup_old_collections() -> Dict[str, Any]:
                 continue
             
             try:
-                collection = chroma_client.get_collection(name=collection_name)
-                metadata = collection.metadata
+                # chromadb>=1.0 returns metadata with the listing, so no
+                # per-collection get_collection round-trip is needed
+                metadata = collection_info.metadata
                 
-                if metadata and "created_at" in metadata:
+                created_at_epoch = metadata.get("created_at_epoch") if metadata else None
+                if created_at_epoch is None and metadata and "created_at" in metadata:
+                    # Collections created before epoch timestamps were stored
                     created_at = datetime.fromisoformat(metadata["created_at"].replace('Z', '+00:00'))
-                    
-                    if created_at < cutoff_time:
+                    if created_at.tzinfo is None:
+                        created_at = created_at.replace(tzinfo=timezone.utc)
+                    created_at_epoch = created_at.timestamp()
+                
+                if created_at_epoch is not None:
+                    if created_at_epoch < cutoff_epoch:
                         chroma_client.delete_collection(name=collection_name)
+                        invalidate_session_caches(metadata.get("session_id"))
+                        forget_collection(collection_name)
                         cleanup_summary["collections_deleted"] += 1
                         cleanup_summary["deleted_collections"].append({
                             "name": collection_name,
-                            "created_at": metadata["created_at"],
+                            "created_at": metadata.get("created_at") or datetime.fromtimestamp(created_at_epoch, timezone.utc).isoformat(),
                             "session_id": metadata.get("session_id", "unknown")
                         })
                         logger.info(f"Deleted old collection: {collection_name}")
@@ -579,7 +1327,7 @@ def get_session_info(session_id: str) -> Dict[str, Any]:
     collection_name = get_collection_name(session_id)
     
     try:
-        collection = chroma_client.get_collection(name=collection_name)
+        collection = get_cached_collection(collection_name)
         
         return {
             "session_id": session_id,
@@ -589,6 +1337,7 @@ def get_session_info(session_id: str) -> Dict[str, Any]:
             "exists": True
         }
     except Exception:
+        forget_collection(collection_name)
         return {
             "session_id": session_id,
             "collection_name": collection_name,
@@ -627,8 +1376,8 @@ def health_check():
         health_status["services"]["chromadb"] = "down"
     
     # Check RAG Components
-    health_status["services"]["embedding_model"] = "up" if embedding_model is not None else "down"
-    health_status["services"]["tokenizer"] = "up" if tokenizer is not None else "down"
+    health_status["services"]["embedding_model"] = "up" if get_embedding_model() is not None else "down"
+    health_status["services"]["tokenizer"] = "up" if get_tokenizer() is not None else "down"
     
     # Overall status
     core_services = ["chromadb", "embedding_model", "tokenizer"]
@@ -656,8 +1405,10 @@ def index():
         'endpoints': {
             '/health': 'GET - Health check with RAG component status',
             '/embed': 'POST - Process and store document chunks',
+            '/embed_batch': 'POST - Process and store several documents at once',
             '/retrieve': 'POST - Retrieve relevant chunks for query',
-            '/collections': 'GET - List all session collections',
+            '/retrieve_batch': 'POST - Retrieve relevant chunks for several queries at once',
+            '/collections': 'GET - List all session collections (?include_counts=true adds chunk counts)',
             '/collections/<session_id>': 'GET/DELETE - Manage specific session collection',
             '/cleanup': 'POST - Manually trigger cleanup of old collections'
         },
@@ -679,6 +1430,24 @@ def index():
 # MAIN RAG API ENDPOINTS
 # ================================
 
+def read_json_fields() -> Optional[Dict[str, Any]]:
+    """
+    Parse the top-level fields of a JSON request body
+    
+    With ijson installed the body is parsed straight off the request stream,
+    so a multi-megabyte document is never held as raw bytes and a parsed
+    string at the same time. Returns None for a missing or invalid body.
+    """
+    if not request.is_json:
+        return None
+    if ijson is None:
+        return request.get_json(silent=True)
+    
+    try:
+        return dict(ijson.kvitems(request.stream, '', use_float=True))
+    except ijson.JSONError:
+        return None
+
 @app.route('/embed', methods=['POST'])
 def embed_document():
     """
@@ -699,7 +1468,7 @@ def embed_document():
         return jsonify({'error': 'ChromaDB not available'}), 500
     
     # Validate request
-    data = request.json
+    data = read_json_fields()
     if not data:
         return jsonify({'error': 'JSON payload required'}), 400
     
@@ -749,7 +1518,7 @@ def embed_document():
             'session_id': session_id,
             'processing_summary': processing_result['summary'],
             'storage_summary': storage_result,
-            'message': f"Successfully processed and stored {len(processing_result['chunks'])} chunks"
+            'message': f"Successfully processed and stored {processing_result['summary']['total_chunks']} chunks"
         }
         
         return jsonify(response)
@@ -758,6 +1527,112 @@ def embed_document():
         logger.error(f"Error in embed endpoint: {e}")
         return jsonify({'error': f'Processing failed: {str(e)}'}), 500
 
+@app.route('/embed_batch', methods=['POST'])
+def embed_documents():
+    """
+    Process and store several documents in one request
+    
+    All chunks are embedded together and stored in a single pass.
+    
+    Expected JSON payload:
+    {
+        "session_id": "unique_session_id",
+        "documents": [
+            {
+                "content": "Document text content...",
+                "source_url": "https://example.com/article",
+                "title": "Optional document title"
+            }
+        ]
+    }
+    """
+    if not DEPENDENCIES_AVAILABLE:
+        return jsonify({'error': 'RAG dependencies not available'}), 500
+    
+    if not chroma_client:
+        return jsonify({'error': 'ChromaDB not available'}), 500
+    
+    # Validate request
+    data = read_json_fields()
+    if not data:
+        return jsonify({'error': 'JSON payload required'}), 400
+    
+    required_fields = ['documents', 'session_id']
+    for field in required_fields:
+        if field not in data:
+            return jsonify({'error': f'Missing required field: {field}'}), 400
+    
+    documents = data['documents']
+    session_id = data['session_id']
+    
+    # Validate inputs
+    if not isinstance(documents, list) or not documents:
+        return jsonify({'error': 'documents must be a non-empty list'}), 400
+    
+    if len(documents) > MAX_BATCH_DOCUMENTS:
+        return jsonify({'error': f'At most {MAX_BATCH_DOCUMENTS} documents per batch'}), 400
+    
+    for document in documents:
+        if not isinstance(document, dict) or 'content' not in document or 'source_url' not in document:
+            return jsonify({'error': 'Each document needs content and source_url'}), 400
+        if not document['content'].strip():
+            return jsonify({'error': 'Content cannot be empty'}), 400
+    
+    if not session_id.strip():
+        return jsonify({'error': 'Session ID cannot be empty'}), 400
+    
+    logger.info(f"Processing {len(documents)} documents for session {session_id}")
+    
+    try:
+        # Step 1: Process documents (chunk + embed)
+        processing_result = process_documents_for_rag(documents, session_id)
+        
+        if 'error' in processing_result:
+            return jsonify(processing_result), 500
+        
+        # Step 2: Store in ChromaDB
+        storage_result = store_chunks_in_chromadb(
+            chunks=processing_result['chunks'],
+            session_id=session_id
+        )
+        
+        if 'error' in storage_result:
+            return jsonify(storage_result), 500
+        
+        # Step 3: Return success response
+        response = {
+            'success': True,
+            'session_id': session_id,
+            'documents': processing_result['documents'],
+            'processing_summary': processing_result['summary'],
+            'storage_summary': storage_result,
+            'message': f"Successfully processed and stored {processing_result['summary']['total_chunks']} chunks"
+        }
+        
+        return jsonify(response)
+        
+    except Exception as e:
+        logger.error(f"Error in embed_batch endpoint: {e}")
+        return jsonify({'error': f'Processing failed: {str(e)}'}), 500
+
+def parse_retrieval_params(max_results: Any, similarity_threshold: Any):
+    """Validate retrieval parameters, returning (max_results, similarity_threshold, error)"""
+    try:
+        max_results = int(max_results)
+        if max_results < 1 or max_results > 20:
+            return None, None, 'max_results must be between 1 and 20'
+    except (ValueError, TypeError):
+        return None, None, 'max_results must be a valid integer'
+    
+    try:
+        similarity_threshold = float(similarity_threshold)
+        if similarity_threshold < 0.0 or similarity_threshold > 1.0:
+            return None, None, 'similarity_threshold must be between 0.0 and 1.0'
+    except (ValueError, TypeError):
+        return None, None, 'similarity_threshold must be a valid number'
+    
+    return max_results, similarity_threshold, None
+
 @app.route('/retrieve', methods=['POST'])
 def retrieve_chunks():
     """
@@ -800,19 +1675,9 @@ def retrieve_chunks():
         return jsonify({'error': 'Session ID cannot be empty'}), 400
     
     # Validate parameters
-    try:
-        max_results = int(max_results)
-        if max_results < 1 or max_results > 20:
-            return jsonify({'error': 'max_results must be between 1 and 20'}), 400
-    except (ValueError, TypeError):
-        return jsonify({'error': 'max_results must be a valid integer'}), 400
-    
-    try:
-        similarity_threshold = float(similarity_threshold)
-        if similarity_threshold < 0.0 or similarity_threshold > 1.0:
-            return jsonify({'error': 'similarity_threshold must be between 0.0 and 1.0'}), 400
-    except (ValueError, TypeError):
-        return jsonify({'error': 'similarity_threshold must be a valid number'}), 400
+    max_results, similarity_threshold, error = parse_retrieval_params(max_results, similarity_threshold)
+    if error:
+        return jsonify({'error': error}), 400
     
     logger.info(f"Retrieving chunks for query in session {session_id}: '{query[:100]}...'")
     
@@ -834,27 +1699,108 @@ def retrieve_chunks():
         logger.error(f"Error in retrieve endpoint: {e}")
         return jsonify({'error': f'Retrieval failed: {str(e)}'}), 500
 
+@app.route('/retrieve_batch', methods=['POST'])
+def retrieve_chunks_batch():
+    """
+    Retrieve relevant chunks for several queries in one request
+    
+    Expected JSON payload:
+    {
+        "queries": ["first query", "second query"],
+        "session_id": "unique_session_id",
+        "max_results": 5,  // optional, default 5, applies per query
+        "similarity_threshold": 0.7  // optional, default 0.0
+    }
+    """
+    if not DEPENDENCIES_AVAILABLE:
+        return jsonify({'error': 'RAG dependencies not available'}), 500
+    
+    if not chroma_client:
+        return jsonify({'error': 'ChromaDB not available'}), 500
+    
+    # Validate request
+    data = request.json
+    if not data:
+        return jsonify({'error': 'JSON payload required'}), 400
+    
+    required_fields = ['queries', 'session_id']
+    for field in required_fields:
+        if field not in data:
+            return jsonify({'error': f'Missing required field: {field}'}), 400
+    
+    queries = data['queries']
+    session_id = data['session_id']
+    
+    # Validate inputs
+    if not isinstance(queries, list) or not queries:
+        return jsonify({'error': 'queries must be a non-empty list'}), 400
+    
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({'error': f'At most {MAX_BATCH_QUERIES} queries per batch'}), 400
+    
+    if any(not isinstance(query, str) or not query.strip() for query in queries):
+        return jsonify({'error': 'Queries cannot be empty'}), 400
+    
+    if not session_id.strip():
+        return jsonify({'error': 'Session ID cannot be empty'}), 400
+    
+    max_results, similarity_threshold, error = parse_retrieval_params(
+        data.get('max_results', 5),
+        data.get('similarity_threshold', 0.0)
+    )
+    if error:
+        return jsonify({'error': error}), 400
+    
+    logger.info(f"Retrieving chunks for {len(queries)} queries in session {session_id}")
+    
+    try:
+        result = retrieve_relevant_chunks_batch(
+            queries=queries,
+            session_id=session_id,
+            max_results=max_results,
+            similarity_threshold=similarity_threshold
+        )
+        
+        if 'error' in result:
+            return jsonify(result), 500
+        
+        return jsonify(result)
+        
+    except Exception as e:
+        logger.error(f"Error in retrieve_batch endpoint: {e}")
+        return jsonify({'error': f'Retrieval failed: {str(e)}'}), 500
+
 @app.route('/collections', methods=['GET'])
 def list_collections():
-    """List all session collections with metadata"""
+    """
+    List all session collections with metadata
+    
+    Chunk counts cost one ChromaDB round-trip per collection, so they are only
+    included when requested with ?include_counts=true; per-session counts are
+    always available from /collections/<session_id>.
+    """
     if not chroma_client:
         return jsonify({'error': 'ChromaDB not available'}), 500
     
+    include_counts = request.args.get('include_counts', 'false').lower() in ('true', '1', 'yes')
+    
     try:
+        # chromadb>=1.0 returns metadata with the listing itself
         all_collections = chroma_client.list_collections()
         
         session_collections = []
         for collection_info in all_collections:
             if collection_info.name.startswith("session_"):
-                try:
-                    collection = chroma_client.get_collection(name=collection_info.name)
-                    session_collections.append({
-                        "name": collection_info.name,
-                        "chunk_count": collection.count(),
-                        "metadata": collection.metadata
-                    })
-                except Exception as e:
-                    logger.warning(f"Could not get details for collection {collection_info.name}: {e}")
+                entry = {
+                    "name": collection_info.name,
+                    "metadata": collection_info.metadata
+                }
+                if include_counts:
+                    try:
+                        entry["chunk_count"] = collection_info.count()
+                    except Exception as e:
+                        logger.warning(f"Could not count chunks in collection {collection_info.name}: {e}")
+                session_collections.append(entry)
         
         return jsonify({
             "collections": session_collections,
@@ -887,6 +1833,8 @@ def delete_collection(session_id: str):
     try:
         collection_name = get_collection_name(session_id)
         chroma_client.delete_collection(name=collection_name)
+        invalidate_session_caches(session_id)
+        forget_collection(collection_name)
         
         logger.info(f"Deleted collection: {collection_name}")
         return jsonify({
@@ -931,8 +1879,32 @@ def startup_cleanup():
     else:
         logger.warning("ChromaDB not available, skipping startup cleanup")
 
-# Perform startup cleanup when module is loaded
+def startup_warmup():
+    """
+    Load the embedding model and tokenizer and run one tiny forward pass
+    
+    The encode goes through the embedding batcher, so its worker thread is
+    started and the weights are resident before the first real request.
+    """
+    if not DEPENDENCIES_AVAILABLE:
+        logger.warning("RAG dependencies not available, skipping warmup")
+        return
+    
+    try:
+        start = time.monotonic()
+        tokenizer = get_tokenizer()
+        if tokenizer:
+            tokenizer.encode_ordinary("warmup")
+        if get_embedding_model():
+            embedding_batcher.encode(["warmup"])
+        logger.info(f"Warmup complete in {time.monotonic() - start:.2f}s")
+    except Exception as e:
+        logger.warning(f"Warmup error: {e}")
+
+# Perform startup cleanup and warmup when module is loaded. Gunicorn does not
+# preload the app, so this runs inside each worker after the fork.
 startup_cleanup()
+startup_warmup()
 
 if __name__ == '__main__':
     logger.info("Starting RAG Builder API server...")
@@ -940,6 +1912,7 @@ if __name__ == '__main__':
     logger.info(f"ChromaDB: {CHROMA_HOST}:{CHROMA_PORT}")
     logger.info(f"Session cleanup: {SESSION_CLEANUP_HOURS} hours")
     
+    # Local development entrypoint; the container runs gunicorn with workers
     # Use debug mode from environment variable, default to False for production
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() in ('true', '1', 'yes')
     app.run(host='0.0.0.0', port=5300, debug=debug_mode)
\ No newline at end of file
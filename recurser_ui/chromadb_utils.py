@@ -4,31 +4,104 @@ Shared ChromaDB utilities used across the application
 import chromadb
 import os
 import streamlit as st
+from http_utils import get_http_session, get_worker_pool
 from typing import Optional, List, Dict, Any
 
+CHROMA_HOST = os.getenv('CHROMA_HOST', 'chromadb')
+CHROMA_PORT = int(os.getenv('CHROMA_PORT', '8000'))
+
+# HNSW parameters applied to new collections. Chroma's defaults build a
+# sparse graph and search it with a small candidate list, which costs recall
+# on larger collections; explicit metadata passed by a caller still wins
+DEFAULT_HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 24,
+    "hnsw:construction_ef": 128,
+    "hnsw:search_ef": 100,
+}
+
+def with_hnsw_defaults(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Return collection kwargs with the default HNSW metadata merged in"""
+    return {**kwargs, "metadata": {**DEFAULT_HNSW_METADATA, **(kwargs.get("metadata") or {})}}
+
 @st.cache_resource
 def get_chromadb_client() -> chromadb.HttpClient:
     """
     Get or create a cached ChromaDB client.
     Uses Streamlit's cache to avoid creating multiple connections.
     """
-    return chromadb.HttpClient(
-        host=os.getenv('CHROMA_HOST', 'chromadb'),
-        port=int(os.getenv('CHROMA_PORT', '8000'))
-    )
+    return chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
 
+@st.cache_data(ttl=10)
 def list_collections() -> List[str]:
-    """Get list of all collection names"""
+    """
+    Get list of all collection names.
+    Cached briefly so Streamlit reruns don't each make a round-trip to ChromaDB.
+    """
     client = get_chromadb_client()
     return [col.name for col in client.list_collections()]
 
+@st.cache_resource(ttl=300)
+def get_collection(collection_name: str) -> Any:
+    """
+    Get a cached collection handle.
+    Fetching a handle is a round-trip to ChromaDB, so one is kept per name.
+    Collections can be deleted or recreated by the RAG builder, so handles
+    expire, and callers refetch a handle once when an operation on it fails.
+    """
+    client = get_chromadb_client()
+    return client.get_collection(collection_name)
+
+@st.cache_data(ttl=5)
+def get_collection_count(collection_name: str) -> int:
+    """Get the number of records in a collection, cached briefly per name"""
+    try:
+        return get_collection(collection_name).count()
+    except Exception:
+        # The cached handle may be stale; retry once with a fresh one
+        get_collection.clear(collection_name)
+        return get_collection(collection_name).count()
+
+@st.cache_data(ttl=5)
+def get_collection_counts(collection_names: List[str]) -> Dict[str, int]:
+    """
+    Get record counts for several collections at once.
+    Each count is its own REST round-trip, so they are issued in parallel
+    on the shared worker pool, through the cached collection handles.
+    """
+    # Handles are looked up here, on the script thread, since pool threads
+    # have no script context for Streamlit's resource cache
+    handles = [get_collection(name) for name in collection_names]
+    
+    def count(collection: Any) -> Optional[int]:
+        try:
+            return collection.count()
+        except Exception:
+            return None
+    
+    counts = dict(zip(collection_names, get_worker_pool().map(count, handles)))
+    for name, value in counts.items():
+        if value is None:
+            # The cached handle may be stale; retry once with a fresh one
+            get_collection.clear(name)
+            counts[name] = get_collection(name).count()
+    return counts
+
+def clear_collection_caches() -> None:
+    """Drop cached collection listings and counts after a mutation"""
+    list_collections.clear()
+    get_collection_count.clear()
+    get_collection_counts.clear()
+
 def create_collection_safe(name: str, **kwargs) -> Optional[Any]:
     """
     Safely create a collection, handling errors gracefully
     """
     try:
         client = get_chromadb_client()
-        return client.create_collection(name, **kwargs)
+        collection = client.create_collection(name, **with_hnsw_defaults(kwargs))
+        clear_collection_caches()
+        return collection
     except Exception as e:
         st.error(f"Error creating collection '{name}': {e}")
         return None
@@ -39,7 +112,9 @@ def get_or_create_collection(name: str, **kwargs) -> Optional[Any]:
     """
     try:
         client = get_chromadb_client()
-        return client.get_or_create_collection(name, **kwargs)
+        collection = client.get_or_create_collection(name, **with_hnsw_defaults(kwargs))
+        clear_collection_caches()
+        return collection
     except Exception as e:
         st.error(f"Error accessing collection '{name}': {e}")
         return None
@@ -51,6 +126,8 @@ def delete_collection_safe(name: str) -> bool:
     try:
         client = get_chromadb_client()
         client.delete_collection(name)
+        get_collection.clear()
+        clear_collection_caches()
         return True
     except Exception as e:
         st.error(f"Error deleting collection '{name}': {e}")
@@ -61,12 +138,9 @@ def get_collection_stats(collection_name: str) -> Dict[str, Any]:
     Get statistics for a collection
     """
     try:
-        client = get_chromadb_client()
-        collection = client.get_collection(collection_name)
-        
         return {
             "name": collection_name,
-            "count": collection.count(),
+            "count": get_collection_count(collection_name),
             # Add more stats as needed
         }
     except Exception as e:
@@ -76,14 +150,9 @@ def check_chromadb_health() -> Dict[str, Any]:
     """
     Check ChromaDB connection health
     """
-    import requests
-    
-    host = os.getenv('CHROMA_HOST', 'chromadb')
-    port = int(os.getenv('CHROMA_PORT', '8000'))
-    
     try:
-        response = requests.get(
-            f"http://{host}:{port}/api/v2/heartbeat",
+        response = get_http_session().get(
+            f"http://{CHROMA_HOST}:{CHROMA_PORT}/api/v2/heartbeat",
             timeout=2
         )
         return {
@@ -3,68 +3,121 @@
 Debug script to test individual services and identify issues
 """
 
-import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared keep-alive session so repeated probes reuse pooled connections
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=2, backoff_factor=0.1)
+))
+
+HEALTH_CHECKS = [
+    ("Optimizer Health", "http://optimizer:5050/health", "GET", None),
+    ("Search Engine Health", "http://search-engine:5150/health", "GET", None),
+    ("LLM Dispatcher Health", "http://llm-dispatcher:5100/health", "GET", None),
+    ("ChromaDB Health", "http://chromadb:8000/api/v2/heartbeat", "GET", None),
+]
+
+FUNCTIONAL_TESTS = [
+    (
+        "Optimizer Query",
+        "http://optimizer:5050/query",
+        "POST",
+        {"prompt": "Optimize this search query: 'where is brazil'"},
+    ),
+    (
+        "Search Engine Query",
+        "http://search-engine:5150/query",
+        "POST",
+        {"search_query": "where is brazil"},
+    ),
+    (
+        "LLM Dispatcher Query",
+        "http://llm-dispatcher:5100/query",
+        "POST",
+        {"prompt": "Say 'Hello, I'm working!' and nothing else."},
+    ),
+]
 
 
-def test_service(name, url, method="GET", data=None, timeout=10):
-    """Test a service endpoint"""
-    print(f"\n🔍 Testing {name} at {url}")
-    print(f"Method: {method}")
+def test_service(name, url, method="GET", data=None, timeout=10, log=print):
+    """Test a service endpoint, writing its report through log"""
+    log(f"\n🔍 Testing {name} at {url}")
+    log(f"Method: {method}")
 
     try:
         if method == "GET":
-            response = requests.get(url, timeout=timeout)
+            response = SESSION.get(url, timeout=timeout)
         elif method == "POST":
-            response = requests.post(url, json=data, timeout=timeout)
+            response = SESSION.post(url, json=data, timeout=timeout)
         else:
-            print(f"❌ Unknown method: {method}")
+            log(f"❌ Unknown method: {method}")
             return False
 
-        print(f"Status Code: {response.status_code}")
-        print(f"Response Headers: {dict(response.headers)}")
-        print(f"Response Text: {response.text[:500]}...")
+        log(f"Status Code: {response.status_code}")
+        log(f"Response Headers: {dict(response.headers)}")
+        log(f"Response Text: {response.text[:500]}...")
 
         if response.status_code == 200:
             try:
-                json_data = response.json()
-                print(f"✅ JSON Response: {json.dumps(json_data, indent=2)[:500]}...")
+                json_data = orjson.loads(response.content)
+                log(f"✅ JSON Response: {orjson.dumps(json_data, option=orjson.OPT_INDENT_2).decode()[:500]}...")
                 return True
-            except json.JSONDecodeError as e:
-                print(f"❌ JSON Parse Error: {e}")
+            except orjson.JSONDecodeError as e:
+                log(f"❌ JSON Parse Error: {e}")
                 return False
         else:
-            print(f"❌ HTTP Error: {response.status_code}")
+            log(f"❌ HTTP Error: {response.status_code}")
             return False
 
     except requests.exceptions.ConnectionError:
-        print(f"❌ Connection Error: Cannot connect to {name}")
+        log(f"❌ Connection Error: Cannot connect to {name}")
         return False
     except requests.exceptions.Timeout:
-        print(f"❌ Timeout Error: {name} took too long to respond")
+        log(f"❌ Timeout Error: {name} took too long to respond")
         return False
     except Exception as e:
-        print(f"❌ Unexpected Error: {e}")
+        log(f"❌ Unexpected Error: {e}")
         return False
 
 
+def run_tests(tests):
+    """
+    Run service tests in parallel and print their reports in the given order
+
+    Each test is a (name, url, method, data) tuple; returns a dict of name to
+    pass/fail.
+    """
+
+    def run(test):
+        lines = []
+        result = test_service(*test, log=lines.append)
+        return result, lines
+
+    with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+        outcomes = list(executor.map(run, tests))
+
+    results = {}
+    for test, (result, lines) in zip(tests, outcomes):
+        print("\n".join(lines))
+        results[test[0]] = result
+    return results
+
+
 def main():
     """Test all services"""
     print("🚀 Starting service debug tests...")
 
     # Test health endpoints
-    services = [
-        ("Optimizer Health", "http://optimizer:5050/health", "GET"),
-        ("Search Engine Health", "http://search-engine:5150/health", "GET"),
-        ("LLM Dispatcher Health", "http://llm-dispatcher:5100/health", "GET"),
-        ("ChromaDB Health", "http://chromadb:8000/api/v2/heartbeat", "GET"),
-    ]
-
-    health_results = {}
-    for name, url, method in services:
-        health_results[name] = test_service(name, url, method)
+    health_results = run_tests(HEALTH_CHECKS)
 
     print("\n" + "=" * 50)
     print("📊 Health Check Results:")
@@ -75,33 +128,7 @@ def main():
     # Test functional endpoints
     print("\n" + "=" * 50)
     print("🧪 Testing Functional Endpoints:")
-
-    # Test Optimizer
-    print("\n1. Testing Optimizer Query:")
-    test_service(
-        "Optimizer Query",
-        "http://optimizer:5050/query",
-        "POST",
-        {"prompt": "Optimize this search query: 'where is brazil'"},
-    )
-
-    # Test Search Engine
-    print("\n2. Testing Search Engine:")
-    test_service(
-        "Search Engine Query",
-        "http://search-engine:5150/query",
-        "POST",
-        {"search_query": "where is brazil"},
-    )
-
-    # Test LLM Dispatcher
-    print("\n3. Testing LLM Dispatcher:")
-    test_service(
-        "LLM Dispatcher Query",
-        "http://llm-dispatcher:5100/query",
-        "POST",
-        {"prompt": "Say 'Hello, I'm working!' and nothing else."},
-    )
+    run_tests(FUNCTIONAL_TESTS)
 
     print("\n" + "=" * 50)
     print("🎯 Debug Summary:")
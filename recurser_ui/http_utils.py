@@ -0,0 +1,56 @@
+"""
+Shared HTTP utilities used across the application
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    Get or create a cached keep-alive HTTP session.
+    Uses Streamlit's cache so pooled connections to the backend services
+    survive script reruns instead of being reopened on every request.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=50,
+        pool_maxsize=50,
+        # Only idempotent requests are retried after being sent; any request
+        # is retried when the connection could not be made at all
+        max_retries=Retry(total=2, backoff_factor=0.1)
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def get_worker_pool() -> ThreadPoolExecutor:
+    """
+    Get the process-wide thread pool for concurrent service requests.
+    Shared across reruns and sessions so fan-outs don't start and join
+    fresh threads on every click; pages never shut it down.
+    """
+    return ThreadPoolExecutor(max_workers=16, thread_name_prefix="recurser-probe")
+
+@st.cache_resource
+def get_pipeline_pool() -> ThreadPoolExecutor:
+    """
+    Get the process-wide thread pool that runs whole query pipelines.
+    Kept apart from get_worker_pool because a pipeline blocks on requests it
+    submits there, and sharing one pool could leave those requests queued
+    behind the pipelines waiting for them.
+    """
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="recurser-pipeline")
+
+def parse_json(response: requests.Response):
+    """
+    Decode a response body with orjson.
+    orjson.JSONDecodeError subclasses json.JSONDecodeError, so existing
+    handlers for the stdlib error still apply.
+    """
+    return orjson.loads(response.content)
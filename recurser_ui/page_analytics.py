@@ -1,8 +1,10 @@
 # analytics.py
 import os
+from concurrent.futures import as_completed
+from functools import lru_cache, partial
 
-import requests
 import streamlit as st
+from http_utils import get_http_session, get_worker_pool, parse_json
 
 SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "search-engine")
 SEARCH_ENGINE_PORT = os.getenv("SEARCH_ENGINE_PORT", "5150")
@@ -13,87 +15,164 @@ OPTIMIZER_PORT = os.getenv("OPTIMIZER_PORT", "5050")
 LLM_DISPATCHER = os.getenv("LLM_DISPATCHER", "llm-dispatcher")
 LLM_DISPATCHER_PORT = os.getenv("LLM_DISPATCHER_PORT", "5100")
 
+# Service URLs are fixed for the life of the process, so build them once
+ENDPOINTS = {
+    "search_query": f"http://{SEARCH_ENGINE}:{SEARCH_ENGINE_PORT}/query",
+    "scrape": f"http://{SCRAPER}:{SCRAPER_PORT}/scrape",
+    "optimizer_health": f"http://{OPTIMIZER}:{OPTIMIZER_PORT}/health",
+    "dispatcher_health": f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/health",
+}
+
+# Request timeouts (seconds) per kind of probe, and the overall time
+# "Run all tests" waits before reporting unfinished probes as slow
+TIMEOUTS = {"health": 5, "query": 15, "scrape": 15}
+RUN_ALL_DEADLINE = 20
+
+
+def get_health(session, url: str) -> dict:
+    """Fetch a service's /health JSON"""
+    response = session.get(url, timeout=TIMEOUTS["health"])
+    return parse_json(response)
+
+
+@st.cache_data(ttl=3)
+def fetch_health(url: str) -> dict:
+    """Fetch a service's /health JSON, shared by every button that needs it"""
+    return get_health(get_http_session(), url)
+
+
+# Service checks. Each takes an HTTP session and a health fetcher and returns
+# a result dict without touching Streamlit, so checks can run on worker threads
+
+
+def check_web_search(session, health) -> dict:
+    response = session.post(
+        ENDPOINTS["search_query"],
+        timeout=TIMEOUTS["query"],
+        json={"search_query": "What is the capital of France?"},
+    )
+    data = parse_json(response)
+    if "response" in data:
+        if len(data["response"]) > 0 and data["response"][0]["title"]:
+            return {"ok": True, "message": "Web search is healthy"}
+        return {"ok": False, "message": "Web search is not healthy"}
+    return {"ok": False, "message": "Unknown error"}
+
+
+def check_web_scraper(session, health) -> dict:
+    response = session.post(
+        ENDPOINTS["scrape"],
+        timeout=TIMEOUTS["scrape"],
+        json={"url": "https://www.google.com"},
+    )
+    data = parse_json(response)
+    if "response" in data:
+        return {"ok": True, "details": [response, data["response"]]}
+    return {"ok": False, "message": "Unknown error", "details": [response]}
+
+
+def check_optimizer(session, health) -> dict:
+    if health(ENDPOINTS["optimizer_health"])["status"] == "healthy":
+        return {"ok": True, "message": "Optimizer is healthy"}
+    return {"ok": False, "message": "Optimizer is not healthy"}
+
+
+def check_llm_dispatcher(session, health) -> dict:
+    if health(ENDPOINTS["dispatcher_health"])["status"] == "healthy":
+        return {"ok": True, "message": "LLM Dispatcher is healthy"}
+    return {"ok": False, "message": "LLM Dispatcher is not healthy"}
+
+
+def check_chromadb(session, health) -> dict:
+    if health(ENDPOINTS["dispatcher_health"])["services"]["chromadb"] == "up":
+        return {"ok": True, "message": "Chromadb is healthy"}
+    return {"ok": False, "message": "Chromadb is not healthy"}
+
+
+def check_llm(session, health) -> dict:
+    if health(ENDPOINTS["dispatcher_health"])["services"]["llm"] == "up":
+        return {"ok": True, "message": "Ollama is healthy"}
+    return {"ok": False, "message": "LLM is not healthy"}
+
+
+# Button label -> check, in grid order (three per row)
+CHECKS = {
+    "Test web search": check_web_search,
+    "Test web scraper": check_web_scraper,
+    "Test optimizer": check_optimizer,
+    "Test llm dispatcher": check_llm_dispatcher,
+    "Test chromadb": check_chromadb,
+    "Test LLM": check_llm,
+}
+
+
+def run_check(check, session, health) -> dict:
+    """Run a check, turning any failure into an error result"""
+    try:
+        return check(session, health)
+    except Exception as e:
+        return {"ok": False, "message": f"{type(e).__name__}: {e}"}
+
+
+def render_check(result: dict):
+    """Show a check result"""
+    for detail in result.get("details", []):
+        st.write(detail)
+    if result.get("message"):
+        if result["ok"]:
+            st.success(result["message"])
+        else:
+            st.error(f"❌ Error: {result['message']}")
+
+
+def run_all_checks():
+    """Run every check concurrently, showing each result as it arrives"""
+    placeholders = {label: st.empty() for label in CHECKS}
+    for label, placeholder in placeholders.items():
+        placeholder.info(f"⏳ {label}...")
+
+    # Resolved here, on the script thread, since pool threads have no script
+    # context to look up Streamlit's resource cache from
+    session = get_http_session()
+    # Checks that finish later reuse /health responses fetched earlier in the run
+    health = lru_cache(maxsize=None)(partial(get_health, session))
+    pool = get_worker_pool()
+    futures = {
+        pool.submit(run_check, check, session, health): label
+        for label, check in CHECKS.items()
+    }
+    try:
+        for future in as_completed(futures, timeout=RUN_ALL_DEADLINE):
+            label = futures[future]
+            with placeholders[label].container():
+                st.markdown(f"**{label}**")
+                render_check(future.result())
+    except TimeoutError:
+        st.warning(f"Some probes exceeded the {RUN_ALL_DEADLINE}s deadline")
+        for future, label in futures.items():
+            if not future.done():
+                # Drop it if still queued; a running probe ends at its own timeout
+                future.cancel()
+                placeholders[label].warning(f"🟡 {label}: slow")
+
+
+@st.fragment
+def service_tests():
+    """Service test buttons; a click reruns only this fragment, not the page"""
+    if st.button("🔬 Run all tests", type="primary", use_container_width=True):
+        run_all_checks()
+
+    # Arrange buttons in a 3-column grid
+    labels = list(CHECKS)
+    for row in range(0, len(labels), 3):
+        cols = st.columns(3)
+        for col, label in zip(cols, labels[row : row + 3]):
+            with col:
+                if st.button(label, use_container_width=True):
+                    with st.spinner("Testing..."):
+                        render_check(run_check(CHECKS[label], get_http_session(), fetch_health))
+
 
 def streamlit_page():
     st.title("📊 Analytics Dashboard")
-    # Arrange buttons in a 3-column grid
-    cols = st.columns(3)
-
-    # First row
-    with cols[0]:
-        if st.button("Test web search", use_container_width=True):
-            with st.spinner("Searching..."):
-                response = requests.post(
-                    f"http://{SEARCH_ENGINE}:{SEARCH_ENGINE_PORT}/query",
-                    timeout=60,
-                    json={"search_query": "What is the capital of France?"},
-                )
-                data = response.json()
-                if "response" in data:
-                    if len(data["response"]) > 0 and data["response"][0]["title"]:
-                        st.success("Web search is healthy")
-                    else:
-                        st.error(f"❌ Error: {'Web search is not healthy'}")
-                else:
-                    st.error(f"❌ Error: {'Unknown error'}")
-    with cols[1]:
-        if st.button("Test web scraper", use_container_width=True):
-            with st.spinner("Searching..."):
-                response = requests.post(
-                    f"http://{SCRAPER}:{SCRAPER_PORT}/scrape",
-                    timeout=60,
-                    json={"url": "https://www.google.com"},
-                )
-                st.write(response)
-                data = response.json()
-                if "response" in data:
-                    st.write(data["response"])
-                else:
-                    st.error(f"❌ Error: {'Unknown error'}")
-    with cols[2]:
-        if st.button("Test optimizer", use_container_width=True):
-            with st.spinner("Optimizing..."):
-                response = requests.get(
-                    f"http://{OPTIMIZER}:{OPTIMIZER_PORT}/health", timeout=60
-                )
-                response = response.json()
-                if response["status"] == "healthy":
-                    st.success("Optimizer is healthy")
-                else:
-                    st.error(f"❌ Error: {'Optimizer is not healthy'}")
-
-    cols = st.columns(3)
-    # Second row
-    with cols[0]:
-        if st.button("Test llm dispatcher", use_container_width=True):
-            with st.spinner("Testing..."):
-                response = requests.get(
-                    f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/health", timeout=60
-                )
-                response = response.json()
-                if response["status"] == "healthy":
-                    st.success("LLM Dispatcher is healthy")
-                else:
-                    st.error(f"❌ Error: {'LLM Dispatcher is not healthy'}")
-    with cols[1]:
-        if st.button("Test chromadb", use_container_width=True):
-            with st.spinner("Testing..."):
-                response = requests.get(
-                    f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/health", timeout=60
-                )
-                response = response.json()
-                if response["services"]["chromadb"] == "up":
-                    st.success("Chromadb is healthy")
-                else:
-                    st.error(f"❌ Error: {'Chromadb is not healthy'}")
-    with cols[2]:
-        if st.button("Test LLM", use_container_width=True):
-            with st.spinner("Testing..."):
-                response = requests.get(
-                    f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/health", timeout=60
-                )
-                response = response.json()
-                if response["services"]["llm"] == "up":
-                    st.success("Ollama is healthy")
-                else:
-                    st.error(f"❌ Error: {'LLM is not healthy'}")
+    service_tests()
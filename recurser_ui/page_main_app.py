@@ -1,116 +1,194 @@
+import html
+import re
+import threading
 import time
+from concurrent.futures import Future
 
 import streamlit as st
+from http_utils import get_pipeline_pool
 from query_flow import run_query_pipeline
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 
-def streamlit_page():
-    """Main RAG application page"""
-    st.title("🤖 Recurser - Intelligent Search Assistant")
-    st.markdown(
-        "Ask complex questions and let our AI-powered RAG pipeline find comprehensive answers from the web."
-    )
+# Theme-aware styling for the main page. It is resent on every rerun, so
+# comments and whitespace are stripped once here to keep the payload small
+MAIN_APP_CSS = """
+<style>
+:root {
+    --primary-gradient: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
+    --primary-color: #667eea;
+    --border-radius: 10px;
+}
 
-    # Add theme-aware styling
-    st.markdown(
-        """
-    <style>
-    :root {
-        --primary-gradient: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-        --primary-color: #667eea;
-        --border-radius: 10px;
-    }
-    
-    /* Theme-aware answer box */
-    .answer-box {
-        background-color: var(--background-color);
-        border: 1px solid var(--border-color);
-        padding: 1.5rem;
-        border-radius: var(--border-radius);
-        border-left: 5px solid var(--primary-color);
-        margin: 1rem 0;
-        transition: all 0.3s ease;
-    }
-    
-    .answer-box:hover {
-        box-shadow: 0 4px 12px rgba(102, 126, 234, 0.15);
-        transform: translateY(-1px);
-    }
-    
-    .answer-title {
-        margin-top: 0;
-        color: var(--text-color);
-        font-weight: 600;
-        font-size: 1.1rem;
-    }
-    
-    .answer-content {
-        margin-bottom: 0;
-        line-height: 1.6;
-        color: var(--text-color);
-    }
+/* Theme-aware answer box */
+.answer-box {
+    background-color: var(--background-color);
+    border: 1px solid var(--border-color);
+    padding: 1.5rem;
+    border-radius: var(--border-radius);
+    border-left: 5px solid var(--primary-color);
+    margin: 1rem 0;
+    transition: all 0.3s ease;
+}
 
-    /* Hover effect for buttons */
-    .stButton > button:hover {
-        cursor: pointer;
-        transform: translateY(-2px);
-        transition: transform 0.2s ease;
-    }
+.answer-box:hover {
+    box-shadow: 0 4px 12px rgba(102, 126, 234, 0.15);
+    transform: translateY(-1px);
+}
 
-    .stButton > button:active {
-        transform: translateY(0);
-    }
+.answer-title {
+    margin-top: 0;
+    color: var(--text-color);
+    font-weight: 600;
+    font-size: 1.1rem;
+}
 
-    /* Enhanced text area styling */
-    .stTextArea > div > div > textarea {
-        border-radius: 8px;
-        transition: border-color 0.3s ease;
-    }
+.answer-content {
+    margin-bottom: 0;
+    line-height: 1.6;
+    color: var(--text-color);
+}
 
-    .stTextArea > div > div > textarea:focus {
-        border-color: var(--primary-color);
-        box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-    }
+/* Hover effect for buttons */
+.stButton > button:hover {
+    cursor: pointer;
+    transform: translateY(-2px);
+    transition: transform 0.2s ease;
+}
 
-    /* Progress bar enhancement */
-    .stProgress > div > div > div > div {
-        background: var(--primary-gradient);
-    }
-    
-    /* Detect theme and set CSS variables */
-    @media (prefers-color-scheme: dark) {
-        :root {
-            --background-color: rgba(28, 31, 36, 0.6);
-            --border-color: rgba(250, 250, 250, 0.2);
-            --text-color: #fafafa;
-        }
-    }
-    
-    @media (prefers-color-scheme: light) {
-        :root {
-            --background-color: rgba(240, 242, 246, 0.8);
-            --border-color: rgba(0, 0, 0, 0.1);
-            --text-color: #262730;
-        }
-    }
-    
-    /* Fallback for browsers that don't support prefers-color-scheme */
-    [data-theme="dark"] {
+.stButton > button:active {
+    transform: translateY(0);
+}
+
+/* Enhanced text area styling */
+.stTextArea > div > div > textarea {
+    border-radius: 8px;
+    transition: border-color 0.3s ease;
+}
+
+.stTextArea > div > div > textarea:focus {
+    border-color: var(--primary-color);
+    box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
+}
+
+/* Progress bar enhancement */
+.stProgress > div > div > div > div {
+    background: var(--primary-gradient);
+}
+
+/* Detect theme and set CSS variables */
+@media (prefers-color-scheme: dark) {
+    :root {
         --background-color: rgba(28, 31, 36, 0.6);
         --border-color: rgba(250, 250, 250, 0.2);
         --text-color: #fafafa;
     }
-    
-    [data-theme="light"] {
+}
+
+@media (prefers-color-scheme: light) {
+    :root {
         --background-color: rgba(240, 242, 246, 0.8);
         --border-color: rgba(0, 0, 0, 0.1);
         --text-color: #262730;
     }
-    </style>
-    """,
-        unsafe_allow_html=True,
+}
+
+/* Fallback for browsers that don't support prefers-color-scheme */
+[data-theme="dark"] {
+    --background-color: rgba(28, 31, 36, 0.6);
+    --border-color: rgba(250, 250, 250, 0.2);
+    --text-color: #fafafa;
+}
+
+[data-theme="light"] {
+    --background-color: rgba(240, 242, 246, 0.8);
+    --border-color: rgba(0, 0, 0, 0.1);
+    --text-color: #262730;
+}
+</style>
+"""
+MAIN_APP_CSS = re.sub(r"\s+", " ", re.sub(r"/\*.*?\*/", "", MAIN_APP_CSS, flags=re.S)).strip()
+
+
+# Styled answer box, filled in with render_answer_box
+ANSWER_BOX_TEMPLATE = (
+    '<div class="answer-box"><h4 class="answer-title">{title}</h4>'
+    '<p class="answer-content">{body}</p></div>'
+)
+
+
+def render_answer_box(title: str, answer: str) -> str:
+    """Build the answer box HTML, escaping the answer so it renders as text"""
+    return ANSWER_BOX_TEMPLATE.format(title=title, body=html.escape(answer))
+
+
+class PipelineFailed(Exception):
+    """Raised by cached_pipeline so that error results are not cached"""
+
+    def __init__(self, result: dict):
+        super().__init__(result.get("answer", "Unknown error"))
+        self.result = result
+
+
+@st.cache_data(ttl=600, max_entries=128, show_spinner=False)
+def cached_pipeline(query_key: str, _user_query: str, _on_progress=None) -> dict:
+    """
+    Run the query pipeline, reusing answers to the same query for 10 minutes
+
+    Streamlit computes each cache key under a lock, so a session asking a
+    question that is already running waits for that run and then gets the
+    cached answer, with the status messages replayed in its own page.
+    Only query_key (see normalize_query) is hashed; the pipeline gets the
+    question exactly as it was typed.
+    """
+    result = run_query_pipeline(_user_query, on_progress=_on_progress)
+    if result.get("error", False):
+        raise PipelineFailed(result)
+    return result
+
+
+def normalize_query(user_query: str) -> str:
+    """Cache key for a query: whitespace collapsed so trivial variants share a result"""
+    return " ".join(user_query.split())
+
+
+def submit_query_pipeline(user_query: str, log_container, stage: dict) -> Future:
+    """
+    Start the query pipeline on the shared pipeline pool
+
+    The worker is attached to the session's script context, so the
+    pipeline's status messages still render, into log_container. The
+    pipeline records its current step in stage as (percent, text).
+    """
+    query_key = normalize_query(user_query)
+    ctx = get_script_run_ctx()
+
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        with log_container:
+            try:
+                return cached_pipeline(
+                    query_key,
+                    user_query,
+                    _on_progress=lambda *step: stage.update(step=step),
+                )
+            except PipelineFailed as e:
+                return e.result
+
+    return get_pipeline_pool().submit(run)
+
+
+def streamlit_page():
+    """Main RAG application page"""
+    st.title("🤖 Recurser - Intelligent Search Assistant")
+    st.markdown(
+        "Ask complex questions and let our AI-powered RAG pipeline find comprehensive answers from the web."
     )
 
+    # Add theme-aware styling. Streamlit drops any element a rerun does not
+    # emit again, so the stylesheet can't be limited to the first run
+    st.markdown(MAIN_APP_CSS, unsafe_allow_html=True)
+
     # Query input section
     with st.container():
         user_query = st.text_area(
@@ -129,6 +207,10 @@ def streamlit_page():
             use_container_width=True,
             disabled=not user_query.strip(),
         )
+    with col3:
+        if st.button("🧹 Clear cache", use_container_width=True):
+            cached_pipeline.clear()
+            st.toast("Cached answers cleared")
 
     # Processing section
     if submit_button and user_query.strip():
@@ -148,22 +230,35 @@ def streamlit_page():
             status_text = st.empty()
 
             # Start processing
-            start_time = time.time()
+            start_ns = time.perf_counter_ns()
 
             # Update progress
             progress_bar.progress(10)
             status_text.text("Initializing pipeline...")
 
-            # Run the query pipeline
+            # Run the query pipeline on a worker thread so the progress bar
+            # keeps moving while it works
             try:
-                result = run_query_pipeline(user_query)
+                stage = {"step": (10, "Initializing pipeline...")}
+                future = submit_query_pipeline(user_query, st.container(), stage)
+                progress = 10
+                while not future.done():
+                    time.sleep(0.2)
+                    # Jump to each step as the pipeline reports it, creeping
+                    # forward in between but never past the next step
+                    step_progress, step_text = stage["step"]
+                    progress = max(progress, step_progress)
+                    progress = min(progress + 1, step_progress + 14, 95)
+                    progress_bar.progress(progress)
+                    status_text.text(step_text)
+                result = future.result()
 
                 # Update progress
                 progress_bar.progress(100)
                 status_text.text("Complete!")
 
                 # Calculate processing time
-                processing_time = time.time() - start_time
+                processing_time = (time.perf_counter_ns() - start_ns) / 1e9
 
                 # Display results
                 st.markdown("---")
@@ -186,13 +281,7 @@ def streamlit_page():
 
                     # Create a styled answer box
                     st.markdown(
-                        f"""
-                    <div class="answer-box">
-                        <h4 class="answer-title">Answer:</h4>
-                        <p class="answer-content">{answer}</p>
-                    </div>
-                    """,
-                        unsafe_allow_html=True,
+                        render_answer_box("Answer:", answer), unsafe_allow_html=True
                     )
 
                     # Store result for potential reuse
@@ -230,11 +319,5 @@ def streamlit_page():
         if not result.get("error", False):
             answer = result.get("answer", "No answer was generated.")
             st.markdown(
-                f"""
-            <div class="answer-box">
-                <h4 class="answer-title">Previous Answer:</h4>
-                <p class="answer-content">{answer}</p>
-            </div>
-            """,
-                unsafe_allow_html=True,
+                render_answer_box("Previous Answer:", answer), unsafe_allow_html=True
             )
@@ -2,6 +2,7 @@ import streamlit as st
 import os
 import sys
 import requests
+from http_utils import get_http_session, get_worker_pool
 from datetime import datetime
 
 # Try to import chromadb with better error handling
@@ -18,6 +19,31 @@ except Exception as e:
     CHROMADB_VERSION = None
     st.error(f"Error loading ChromaDB: {e}")
 
+CHROMA_HOST = os.getenv('CHROMA_HOST', 'chromadb')
+CHROMA_PORT = int(os.getenv('CHROMA_PORT', '8000'))
+
+# Environment shown in the debug expander, as it was when the process started
+DEBUG_ENV_VARS = {
+    "CHROMA_HOST": os.getenv('CHROMA_HOST', 'not set'),
+    "CHROMA_PORT": os.getenv('CHROMA_PORT', 'not set'),
+    "PYTHONPATH": os.getenv('PYTHONPATH', 'not set'),
+    "PATH": os.getenv('PATH', 'not set')[:100] + "..."  # Truncate long PATH
+}
+
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_heartbeat(host: str, port: int):
+    """Probe the ChromaDB heartbeat, returning (status_code, json or None)"""
+    response = get_http_session().get(f"http://{host}:{port}/api/v2/heartbeat", timeout=5)
+    return response.status_code, response.json() if response.status_code == 200 else None
+
+@st.cache_data(ttl=300, show_spinner="Listing installed packages...")
+def pip_list() -> str:
+    """Output of `pip list`, which starts a whole interpreter, so it is cached"""
+    import subprocess
+    result = subprocess.run([sys.executable, "-m", "pip", "list"],
+                            capture_output=True, text=True)
+    return result.stdout
+
 def streamlit_page():
     """ChromaDB Connection Test Page"""
     st.title("ChromaDB Connection Test")
@@ -29,21 +55,41 @@ def streamlit_page():
         return
     
     # Get connection parameters
-    host = os.getenv('CHROMA_HOST', 'chromadb')
-    port = int(os.getenv('CHROMA_PORT', '8000'))
+    host = CHROMA_HOST
+    port = CHROMA_PORT
     
     st.write(f"**Connection Parameters:**")
     st.code(f"Host: {host}\nPort: {port}")
     
+    # Imported here so a missing chromadb module is reported above rather
+    # than failing the page import
+    from chromadb_utils import get_chromadb_client
+    
+    # Start listing collections in the background so it overlaps the
+    # heartbeat probe. The cached client is fetched here, on the script
+    # thread, since pool threads have no script context for the cache
+    if st.session_state.get("reset_chromadb_client"):
+        get_chromadb_client.clear()
+    
+    client = None
+    client_error = None
+    try:
+        client = get_chromadb_client()
+        collections_future = get_worker_pool().submit(client.list_collections)
+    except Exception as e:
+        client_error = e
+    
     # Test 1: Basic connectivity
     st.header("1. Basic Connectivity Test")
+    if st.button("🔄 Refresh heartbeat"):
+        fetch_heartbeat.clear()
     try:
-        response = requests.get(f"http://{host}:{port}/api/v2/heartbeat", timeout=5)
-        if response.status_code == 200:
-            st.success(f"✅ ChromaDB is reachable! Status: {response.status_code}")
-            st.json(response.json())
+        status_code, heartbeat = fetch_heartbeat(host, port)
+        if status_code == 200:
+            st.success(f"✅ ChromaDB is reachable! Status: {status_code}")
+            st.json(heartbeat)
         else:
-            st.error(f"❌ ChromaDB returned status: {response.status_code}")
+            st.error(f"❌ ChromaDB returned status: {status_code}")
     except requests.exceptions.ConnectionError:
         st.error(f"❌ Cannot connect to ChromaDB at {host}:{port}")
         st.info("Make sure the ChromaDB container is running: `docker ps`")
@@ -54,22 +100,28 @@ def streamlit_page():
     
     # Test 2: ChromaDB Client
     st.header("2. ChromaDB Client Test")
-    client = None
+    # Handled before the client test was started, above
+    st.button("♻️ Reset client", key="reset_chromadb_client")
+    
     try:
-        # Create client with explicit error handling
-        st.write("Creating ChromaDB client...")
-        client = chromadb.HttpClient(host=host, port=port)
+        # Report a failure to get the shared client from above
+        st.write("Getting ChromaDB client...")
+        if client_error is not None:
+            raise client_error
         st.success("✅ ChromaDB client initialized successfully!")
         
         # List collections
         st.write("Listing collections...")
-        collections = client.list_collections()
+        collections = collections_future.result()
         st.write(f"**Number of collections:** {len(collections)}")
         
         if collections:
             st.write("**Existing collections:**")
-            for col in collections:
-                st.write(f"- {col.name}")
+            st.dataframe(
+                {"collection": [col.name for col in collections]},
+                hide_index=True,
+                use_container_width=True
+            )
         else:
             st.info("No collections found (this is normal for a fresh instance)")
             
@@ -146,6 +198,7 @@ def streamlit_page():
     # Test 4: Performance test
     if client:
         st.header("4. Performance Test")
+        batch_size = st.slider("Batch size", 1, 1000, 100)
         
         if st.button("Run Performance Test"):
             try:
@@ -154,23 +207,27 @@ def streamlit_page():
                 # Create collection for performance test
                 perf_collection = client.get_or_create_collection("performance_test")
                 
+                # Build the payload before timing so only the insert is measured
+                documents = [f"Document {i}" for i in range(batch_size)]
+                ids = [f"perf_doc_{i}" for i in range(batch_size)]
+                
                 # Test insertion speed
-                start_time = time.time()
-                perf_collection.add(
-                    documents=[f"Document {i}" for i in range(100)],
-                    ids=[f"perf_doc_{i}" for i in range(100)]
-                )
-                insert_time = time.time() - start_time
+                start_ns = time.perf_counter_ns()
+                perf_collection.add(documents=documents, ids=ids)
+                insert_time = (time.perf_counter_ns() - start_ns) / 1e9
                 
-                st.success(f"✅ Inserted 100 documents in {insert_time:.2f} seconds")
+                st.success(
+                    f"✅ Inserted {batch_size} documents in {insert_time:.2f} seconds "
+                    f"({batch_size / insert_time:,.0f} docs/sec)"
+                )
                 
                 # Test query speed
-                start_time = time.time()
+                start_ns = time.perf_counter_ns()
                 results = perf_collection.query(
                     query_texts=["test query"],
                     n_results=10
                 )
-                query_time = time.time() - start_time
+                query_time = (time.perf_counter_ns() - start_ns) / 1e9
                 
                 st.success(f"✅ Query executed in {query_time:.3f} seconds")
                 
@@ -183,14 +240,11 @@ def streamlit_page():
     # Debug information
     with st.expander("🔧 Debug Information"):
         st.write("**Environment Variables:**")
-        env_vars = {
-            "CHROMA_HOST": os.getenv('CHROMA_HOST', 'not set'),
-            "CHROMA_PORT": os.getenv('CHROMA_PORT', 'not set'),
-            "PYTHONPATH": os.getenv('PYTHONPATH', 'not set'),
-            "PATH": os.getenv('PATH', 'not set')[:100] + "..."  # Truncate long PATH
-        }
-        for key, value in env_vars.items():
-            st.code(f"{key}: {value}")
+        st.dataframe(
+            {"variable": list(DEBUG_ENV_VARS), "value": list(DEBUG_ENV_VARS.values())},
+            hide_index=True,
+            use_container_width=True
+        )
         
         st.write("**Python Information:**")
         st.code(f"Python version: {sys.version}")
@@ -205,7 +259,4 @@ def streamlit_page():
         
         st.write("**Installed Packages:**")
         if st.button("Show installed packages"):
-            import subprocess
-            result = subprocess.run([sys.executable, "-m", "pip", "list"], 
-                                  capture_output=True, text=True)
-            st.code(result.stdout)
\ No newline at end of file
+            st.code(pip_list())
\ No newline at end of file
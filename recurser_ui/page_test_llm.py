@@ -1,14 +1,21 @@
 import streamlit as st
-import requests
+from concurrent.futures import as_completed
+from http_utils import get_http_session, get_worker_pool
 #import anthropic
 import json
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional
 
 LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'error')
 LLM_DISPATCHER = os.getenv('LLM_DISPATCHER', 'error')
 LLM_DISPATCHER_PORT = os.getenv('LLM_DISPATCHER_PORT', 'error')
 
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_models_status() -> int:
+    """Probe the dispatcher's /models endpoint, returning the status code"""
+    response = get_http_session().get(f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/models", timeout=5)
+    return response.status_code
+
 def streamlit_page():
     if LLM_PROVIDER == 'local':
         local_llm_page()
@@ -20,22 +27,66 @@ def external_llm_page():
     st.title("External LLM Test")
 
     st.write(f"LLM_PROVIDER: **{LLM_PROVIDER}**")
-    response = requests.get(f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/models", timeout=5)
-    if response.status_code == 200:
+    if st.button("🔄 Refresh status"):
+        fetch_models_status.clear()
+    status_code = fetch_models_status()
+    if status_code == 200:
         st.success("✅ LLM Dispatcher is reachable")
     else:
-        st.error(f"Failed to fetch models: {response.status_code}")
+        st.error(f"Failed to fetch models: {status_code}")
 
     if st.button("Test connection"):
-        response = requests.post(f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/query", timeout=60, json={"prompt": "What is the capital of France?"})
-        st.write(response.json())
-        data = response.json()
-        if 'response' in data:
-            st.write(data['response'])
-        else:
-            st.error(f"❌ Error: {'Unknown error'}")
+        render_stream("What is the capital of France?")
             
 
+# Quick tests: (button label, spinner text, prompt)
+LOCAL_TESTS = [
+    ("Test Basic", "Generating...", "Say 'Hello, I'm working!' and nothing else."),
+    ("Test Math", "Calculating...", "What is 25 + 17? Just give the number."),
+    ("Test Completion", "Completing...", "Complete this: The capital of France is"),
+]
+
+def query_dispatcher(session, prompt: str) -> Dict[str, Any]:
+    """Send a prompt to the LLM dispatcher and return its JSON reply"""
+    response = session.post(f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/query", timeout=60, json={"prompt": prompt})
+    return response.json()
+
+def stream_dispatcher(prompt: str) -> Iterator[str]:
+    """
+    Yield the dispatcher's reply to a prompt as it is generated.
+    The dispatcher answers stream requests with server-sent events, each
+    carrying an Ollama-style chunk ({"response": ...}) or {"error": ...}.
+    Rejections such as a full bulkhead (503) come back as a plain JSON error.
+    """
+    with get_http_session().post(f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/query", timeout=60, stream=True, json={"prompt": prompt, "stream": True}) as response:
+        if response.status_code != 200:
+            try:
+                error = response.json().get('error', response.text)
+            except ValueError:
+                error = response.text
+            raise RuntimeError(f"Dispatcher returned status {response.status_code}: {error}")
+        for line in response.iter_lines():
+            if not line.startswith(b"data: "):
+                continue
+            event = json.loads(line[len(b"data: "):])
+            if 'error' in event:
+                raise RuntimeError(event['error'])
+            if event.get('response'):
+                yield event['response']
+
+def render_stream(prompt: str):
+    """Write the reply to a prompt token by token"""
+    try:
+        st.write_stream(stream_dispatcher(prompt))
+    except Exception as e:
+        st.error(f"❌ Error: {e}")
+
+def render_reply(data: Dict[str, Any]):
+    if 'response' in data:
+        st.write(data['response'])
+    else:
+        st.error(f"❌ Error: {'Unknown error'}")
+
 def local_llm_page():
     """Ollama LLM Test Page"""
     st.title("Ollama LLM Test")
@@ -43,38 +94,28 @@ def local_llm_page():
 
     # Test prompts
     st.subheader("Quick Tests")
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        if st.button("Test Basic"):
-            with st.spinner("Generating..."):
-                response = requests.post(f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/query", timeout=60, json={"prompt": "Say 'Hello, I'm working!' and nothing else."})
-                data = response.json()
-                if 'response' in data:
-                    st.write(data['response'])
-                else:
-                    st.error(f"❌ Error: {'Unknown error'}")
-
-
-    with col2:
-        if st.button("Test Math"):
-            with st.spinner("Calculating..."):
-                response = requests.post(f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/query", timeout=60, json={"prompt": "What is 25 + 17? Just give the number."})
-                data = response.json()
-                if 'response' in data:
-                    st.write(data['response'])
-                else:
-                    st.error(f"❌ Error: {'Unknown error'}")
-
-    with col3:
-        if st.button("Test Completion"):
-            with st.spinner("Completing..."):
-                response = requests.post(f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/query", timeout=60, json={"prompt": "Complete this: The capital of France is"})
-                data = response.json()
-                if 'response' in data:
-                    st.write(data['response'])
-                else:
-                    st.error(f"❌ Error: {'Unknown error'}")
+    if st.button("Run all tests"):
+        # Send every prompt at once and show each reply as it arrives
+        session = get_http_session()
+        placeholders = {label: st.empty() for label, _, _ in LOCAL_TESTS}
+        futures = {
+            get_worker_pool().submit(query_dispatcher, session, prompt): label
+            for label, _, prompt in LOCAL_TESTS
+        }
+        for future in as_completed(futures):
+            label = futures[future]
+            with placeholders[label].container():
+                st.markdown(f"**{label}**")
+                try:
+                    render_reply(future.result())
+                except Exception as e:
+                    st.error(f"❌ Error: {type(e).__name__}: {e}")
+
+    for col, (label, spinner_text, prompt) in zip(st.columns(len(LOCAL_TESTS)), LOCAL_TESTS):
+        with col:
+            if st.button(label):
+                with st.spinner(spinner_text):
+                    render_stream(prompt)
 
 if __name__ == "__main__":
     streamlit_page()
\ No newline at end of file
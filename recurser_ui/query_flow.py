@@ -1,10 +1,11 @@
 import json
 import os
 import uuid
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
 import requests
 import streamlit as st
+from http_utils import get_http_session, get_worker_pool, parse_json
 
 SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "search-engine")
 SEARCH_ENGINE_PORT = os.getenv("SEARCH_ENGINE_PORT", "5150")
@@ -17,6 +18,16 @@ LLM_DISPATCHER_PORT = os.getenv("LLM_DISPATCHER_PORT", "5100")
 RAG_BUILDER = os.getenv("RAG_BUILDER", "rag-builder")
 RAG_BUILDER_PORT = os.getenv("RAG_BUILDER_PORT", "5300")
 
+# Service URLs are fixed for the life of the process, so build them once
+ENDPOINTS = {
+    "scrape": f"http://{SCRAPER}:{SCRAPER_PORT}/scrape",
+    "embed_batch": f"http://{RAG_BUILDER}:{RAG_BUILDER_PORT}/embed_batch",
+    "retrieve": f"http://{RAG_BUILDER}:{RAG_BUILDER_PORT}/retrieve",
+    "optimize": f"http://{OPTIMIZER}:{OPTIMIZER_PORT}/query",
+    "search": f"http://{SEARCH_ENGINE}:{SEARCH_ENGINE_PORT}/query",
+    "llm": f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/query",
+}
+
 
 def scrape_content_from_urls(urls: List[str]) -> Dict[str, str]:
     """
@@ -24,18 +35,27 @@ def scrape_content_from_urls(urls: List[str]) -> Dict[str, str]:
     Returns a dict mapping URL to scraped content.
     """
     scraped_content = {}
+    if not urls:
+        return scraped_content
+    
+    session = get_http_session()
+    
+    def scrape(url: str):
+        return session.post(ENDPOINTS["scrape"], json={"url": url}, timeout=30)
     
     for url in urls:
+        st.info(f"📄 Scraping content from: {url[:50]}...")
+    
+    # Scrape every page at once; results are reported in URL order
+    pool = get_worker_pool()
+    futures = [pool.submit(scrape, url) for url in urls]
+    
+    for url, future in zip(urls, futures):
         try:
-            st.info(f"📄 Scraping content from: {url[:50]}...")
-            response = requests.post(
-                f"http://{SCRAPER}:{SCRAPER_PORT}/scrape",
-                json={"url": url},
-                timeout=30,
-            )
+            response = future.result()
             
             if response.status_code == 200:
-                data = response.json()
+                data = parse_json(response)
                 if 'content' in data and data['content'].strip():
                     scraped_content[url] = data['content']
                     st.success(f"✅ Successfully scraped: {url[:50]}...")
@@ -59,37 +79,42 @@ def store_documents_in_rag(scraped_content: Dict[str, str], session_id: str) ->
     success_count = 0
     total_count = len(scraped_content)
     
-    for url, content in scraped_content.items():
-        try:
-            # Prepare document for RAG storage
-            document_data = {
-                "content": content,
-                "session_id": session_id,
-                "source_url": url,
-                "title": f"Scraped content from {url}"
-            }
-            
-            st.info(f"💾 Storing document in RAG: {url[:50]}...")
-            response = requests.post(
-                f"http://{RAG_BUILDER}:{RAG_BUILDER_PORT}/embed",
-                json=document_data,
-                timeout=60,
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('success'):
-                    chunks_stored = data.get('processing_summary', {}).get('total_chunks', 0)
-                    st.success(f"✅ Stored {chunks_stored} chunks from: {url[:50]}...")
-                    success_count += 1
-                else:
-                    st.warning(f"⚠️ Failed to store: {url[:50]}...")
+    # All documents go in one request so the RAG builder embeds and stores
+    # them in a single pass
+    documents = [
+        {
+            "content": content,
+            "source_url": url,
+            "title": f"Scraped content from {url}"
+        }
+        for url, content in scraped_content.items()
+    ]
+    
+    try:
+        st.info(f"💾 Storing {total_count} documents in RAG...")
+        response = get_http_session().post(
+            ENDPOINTS["embed_batch"],
+            json={"documents": documents, "session_id": session_id},
+            timeout=60 * total_count,
+        )
+        
+        if response.status_code == 200:
+            data = parse_json(response)
+            if data.get('success'):
+                for document in data.get('documents', []):
+                    url = document.get('source_url', '')
+                    if 'error' in document:
+                        st.warning(f"⚠️ Failed to store: {url[:50]}...")
+                    else:
+                        st.success(f"✅ Stored {document.get('total_chunks', 0)} chunks from: {url[:50]}...")
+                        success_count += 1
             else:
-                st.warning(f"⚠️ RAG storage failed for: {url[:50]}... (Status: {response.status_code})")
-                
-        except Exception as e:
-            st.warning(f"⚠️ Error storing {url[:50]}...: {str(e)}")
-            continue
+                st.warning("⚠️ Failed to store documents")
+        else:
+            st.warning(f"⚠️ RAG storage failed (Status: {response.status_code})")
+            
+    except Exception as e:
+        st.warning(f"⚠️ Error storing documents: {str(e)}")
     
     st.info(f"📊 RAG Storage Summary: {success_count}/{total_count} documents stored successfully")
     return success_count > 0
@@ -110,14 +135,14 @@ def retrieve_rag_chunks(query: str, session_id: str, max_results: int = 5) -> Li
             "similarity_threshold": 0.1  # Adjust threshold as needed, higher values = more relevant chunks
         }
         
-        response = requests.post(
-            f"http://{RAG_BUILDER}:{RAG_BUILDER_PORT}/retrieve",
+        response = get_http_session().post(
+            ENDPOINTS["retrieve"],
             json=retrieval_data,
             timeout=30,
         )
         
         if response.status_code == 200:
-            data = response.json()
+            data = parse_json(response)
             chunks = data.get('chunks', [])
             
             if chunks:
@@ -135,18 +160,24 @@ def retrieve_rag_chunks(query: str, session_id: str, max_results: int = 5) -> Li
         return []
 
 
-def run_query_pipeline(user_query: str) -> dict:
+def run_query_pipeline(user_query: str, on_progress: Optional[Callable[[int, str], None]] = None) -> dict:
     """
     Run the complete RAG pipeline with proper error handling and status updates.
+    on_progress, if given, is called with (percent, stage) as each step starts.
     """
+    def progress(percent: int, stage: str):
+        if on_progress:
+            on_progress(percent, stage)
+    
     # Generate unique session ID for this query
     session_id = f"query_{uuid.uuid4().hex[:8]}"
     
     try:
         # Step 1: Call optimiser (using the query endpoint)
+        progress(15, "Optimizing query...")
         st.info("🔄 Optimizing your query...")
-        response = requests.post(
-            f"http://{OPTIMIZER}:{OPTIMIZER_PORT}/query",
+        response = get_http_session().post(
+            ENDPOINTS["optimize"],
             json={"query": user_query},
             timeout=30,
         )
@@ -158,7 +189,7 @@ def run_query_pipeline(user_query: str) -> dict:
 
         # Check if response is valid JSON
         try:
-            response_data = response.json()
+            response_data = parse_json(response)
         except json.JSONDecodeError as e:
             st.error(f"❌ Optimizer returned invalid JSON: {response.text}")
             return {"answer": "Error: Invalid response from optimizer", "error": True}
@@ -167,9 +198,10 @@ def run_query_pipeline(user_query: str) -> dict:
         st.success(f"✅ Query optimized: '{optimal_query}'")
 
         # Step 2: Call search engine
+        progress(30, "Searching the web...")
         st.info("🔍 Searching the web...")
-        search_response = requests.post(
-            f"http://{SEARCH_ENGINE}:{SEARCH_ENGINE_PORT}/query",
+        search_response = get_http_session().post(
+            ENDPOINTS["search"],
             json={"search_query": optimal_query},
             timeout=60,
         )
@@ -181,7 +213,7 @@ def run_query_pipeline(user_query: str) -> dict:
 
         # Check if search response is valid JSON
         try:
-            search_data = search_response.json()
+            search_data = parse_json(search_response)
         except json.JSONDecodeError as e:
             st.error(f"❌ Search engine returned invalid JSON: {search_response.text}")
             return {
@@ -202,6 +234,7 @@ def run_query_pipeline(user_query: str) -> dict:
         st.info(f"🧠 Search results: {search_results}")
 
         # Step 3: RAG Processing - Scrape, Store, and Retrieve
+        progress(45, "Processing documents with RAG...")
         st.info("🧠 Processing documents with RAG...")
         
         # Extract URLs from search results for scraping
@@ -227,6 +260,7 @@ def run_query_pipeline(user_query: str) -> dict:
 
         #st.info(f"🧠 RAG chunks: {rag_chunks}")
         # Step 4: Prepare enhanced context from both search results and RAG chunks
+        progress(75, "Generating response with LLM...")
         st.info("🤖 Generating enhanced response with LLM...")
 
 
@@ -266,8 +300,8 @@ Search Results:
 
 Please provide a detailed, accurate answer based on the information above. If the provided information doesn't contain enough details to answer the question completely, please say so."""
         st.info(f"🧠 LLM prompt: {llm_prompt}")
-        llm_response = requests.post(
-            f"http://{LLM_DISPATCHER}:{LLM_DISPATCHER_PORT}/query", json={"prompt": llm_prompt}, timeout=120
+        llm_response = get_http_session().post(
+            ENDPOINTS["llm"], json={"prompt": llm_prompt}, timeout=120
         )
 
         if llm_response.status_code != 200:
@@ -277,7 +311,7 @@ Please provide a detailed, accurate answer based on the information above. If th
 
         # Check if LLM response is valid JSON
         try:
-            llm_data = llm_response.json()
+            llm_data = parse_json(llm_response)
         except json.JSONDecodeError as e:
             st.error(f"❌ LLM dispatcher returned invalid JSON: {llm_response.text}")
             return {
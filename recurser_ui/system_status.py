@@ -3,10 +3,15 @@ from typing import Dict, List, Optional
 
 import requests
 import streamlit as st
+from http_utils import parse_json
 
 
+@st.cache_data(ttl=5, show_spinner=False)
 def check_service_health(service_name: str, url: str, timeout: int = 5) -> Dict:
-    """Check the health of a specific service"""
+    """
+    Check the health of a specific service.
+    Results are cached for a few seconds so reruns don't re-probe every service.
+    """
     try:
         response = requests.get(url, timeout=timeout)
         if response.status_code == 200:
@@ -15,7 +20,7 @@ def check_service_health(service_name: str, url: str, timeout: int = 5) -> Dict:
                 "healthy": True,
                 "response_time": response.elapsed.total_seconds(),
                 "details": (
-                    response.json()
+                    parse_json(response)
                     if response.headers.get("content-type", "").startswith(
                         "application/json"
                     )
@@ -101,6 +106,7 @@ def display_system_status():
 
         # Refresh button
         if st.button("🔄 Refresh Status", use_container_width=True):
+            check_service_health.clear()
             st.rerun()
 
 
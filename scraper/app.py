@@ -2,6 +2,7 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import requests
 import os
+import importlib.util
 from functools import wraps
 from typing import Dict, List, Any, Optional
 import logging
@@ -13,9 +14,14 @@ app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
+# Extracted content is capped at MAX_CONTENT_CHARS, so raw HTML past
+# MAX_PAGE_BYTES is download and parse time for nothing
+MAX_CONTENT_CHARS = 50000
+MAX_PAGE_BYTES = int(os.getenv('MAX_PAGE_BYTES', str(5 * 1024 * 1024)))
+
 # Try to import optional dependencies for better content extraction
 try:
     from bs4 import BeautifulSoup
@@ -24,6 +30,13 @@ except ImportError:
     HAS_BS4 = False
     logger.warning("BeautifulSoup not available, using basic text extraction")
 
+# lxml builds the tree in C; html.parser is the pure-Python fallback
+if importlib.util.find_spec('lxml') is not None:
+    BS4_PARSER = 'lxml'
+else:
+    BS4_PARSER = 'html.parser'
+    logger.warning("lxml not available, using the slower html.parser")
+
 try:
     from readability import Document
     HAS_READABILITY = True
@@ -32,10 +45,40 @@ except ImportError:
     logger.warning("Readability not available, using basic content extraction")
 
 
+def clean_whitespace(text: str) -> str:
+    """Collapse the whitespace left behind by get_text-style extraction"""
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return ' '.join(chunk for chunk in chunks if chunk)
+
+
+def collect_clean_text(root) -> str:
+    """
+    Gather an element's text, stopping once there is more than fits in the
+    content limit
+    
+    Strings are read in document order, as get_text would, and the text
+    gathered so far is cleaned each time its raw size doubles past the
+    limit, so a huge page is not walked to the end only to be truncated.
+    """
+    pieces = []
+    raw_length = 0
+    next_check = MAX_CONTENT_CHARS
+    for string in root.strings:
+        pieces.append(string)
+        raw_length += len(string)
+        if raw_length >= next_check:
+            text = clean_whitespace(''.join(pieces))
+            if len(text) > MAX_CONTENT_CHARS:
+                return text
+            next_check *= 2
+    return clean_whitespace(''.join(pieces))
+
+
 def extract_content_with_bs4(html_content: str, url: str) -> str:
     """Extract clean content using BeautifulSoup"""
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = BeautifulSoup(html_content, BS4_PARSER)
         
         # Remove script and style elements
         for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
@@ -49,19 +92,11 @@ def extract_content_with_bs4(html_content: str, url: str) -> str:
             soup.find('div', id=lambda x: x and any(term in x.lower() for term in ['content', 'article', 'post', 'main']))
         )
         
-        if content_areas:
-            text = content_areas.get_text()
-        else:
+        if not content_areas:
             # Fallback to body content
-            body = soup.find('body')
-            text = body.get_text() if body else soup.get_text()
-        
-        # Clean up whitespace
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
+            content_areas = soup.find('body') or soup
         
-        return text
+        return collect_clean_text(content_areas)
     except Exception as e:
         logger.error(f"Error extracting content with BeautifulSoup: {e}")
         return html_content
@@ -85,6 +120,22 @@ def extract_content_basic(html_content: str) -> str:
     return text
 
 
+def read_capped_text(response: requests.Response) -> str:
+    """Read at most MAX_PAGE_BYTES of a streamed response body as text"""
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        body += chunk
+        if len(body) >= MAX_PAGE_BYTES:
+            logger.info(f"Page body exceeds {MAX_PAGE_BYTES} bytes, reading only the start")
+            break
+    
+    try:
+        return body[:MAX_PAGE_BYTES].decode(response.encoding or 'utf-8', errors='replace')
+    except LookupError:
+        # Unknown charset name in the Content-Type header
+        return body[:MAX_PAGE_BYTES].decode('utf-8', errors='replace')
+
+
 def scrape_url(url: str) -> Dict[str, Any]:
     """
     Scrape content from a URL
@@ -115,16 +166,17 @@ def scrape_url(url: str) -> Dict[str, Any]:
         
         logger.info(f"Fetching content from: {url}")
         
-        # Make request with timeout
-        response = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
-        response.raise_for_status()
-        
-        # Check content type
-        content_type = response.headers.get('content-type', '').lower()
-        if 'text/html' not in content_type and 'text/plain' not in content_type:
-            return {"error": f"Unsupported content type: {content_type}"}
-        
-        html_content = response.text
+        # Make request with timeout; the body is streamed so it is only
+        # downloaded once the content type is known to be usable
+        with requests.get(url, headers=headers, timeout=30, allow_redirects=True, stream=True) as response:
+            response.raise_for_status()
+            
+            # Check content type
+            content_type = response.headers.get('content-type', '').lower()
+            if 'text/html' not in content_type and 'text/plain' not in content_type:
+                return {"error": f"Unsupported content type: {content_type}"}
+            
+            html_content = read_capped_text(response)
         
         # Extract content using best available method
         if HAS_BS4:
@@ -137,8 +189,8 @@ def scrape_url(url: str) -> Dict[str, Any]:
             return {"error": "Extracted content too short, possibly blocked or empty page"}
         
         # Limit content length to prevent memory issues
-        if len(content) > 50000:  # 50k characters limit
-            content = content[:50000] + "... [Content truncated]"
+        if len(content) > MAX_CONTENT_CHARS:
+            content = content[:MAX_CONTENT_CHARS] + "... [Content truncated]"
         
         logger.info(f"Successfully scraped {len(content)} characters from {url}")
         
@@ -209,6 +261,7 @@ def health_check():
         'service': 'scraper',
         'capabilities': {
             'beautifulsoup': HAS_BS4,
+            'html_parser': BS4_PARSER,
             'readability': HAS_READABILITY,
             'basic_extraction': True
         }
@@ -259,4 +312,6 @@ def index():
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5200, debug=True)
\ No newline at end of file
+    # Local development entrypoint; the container runs gunicorn with workers
+    debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() in ('true', '1', 'yes')
+    app.run(host='0.0.0.0', port=5200, debug=debug_mode)
\ No newline at end of file
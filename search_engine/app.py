@@ -13,7 +13,7 @@ app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
 
@@ -80,4 +80,6 @@ def search_engine_request():
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5150, debug=True)
+    # Local development entrypoint; the container runs gunicorn with workers
+    debug_mode = os.getenv("FLASK_DEBUG", "False").lower() in ("true", "1", "yes")
+    app.run(host="0.0.0.0", port=5150, debug=debug_mode)